@@ -0,0 +1,90 @@
+import os
+import json
+import sqlite3
+import threading
+
+
+class AccessStore:
+    """
+    SQLite-backed record of which emails have paid for access.
+
+    The database runs in WAL mode so gunicorn workers can read concurrently while
+    one of them registers a new user. Emails are the primary key, which gives
+    indexed lookups and makes registration an atomic insert.
+    """
+
+    def __init__(self, db_path, legacy_json_path=None):
+        """
+        Parameters:
+            db_path: Path of the SQLite database file.
+            legacy_json_path: Optional users.json file to import on first use.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    email TEXT PRIMARY KEY,
+                    access INTEGER NOT NULL DEFAULT 1,
+                    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        if legacy_json_path:
+            self.migrate_from_json(legacy_json_path)
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def migrate_from_json(self, json_path):
+        """
+        Import users from the legacy users.json format ({"users": [{"email", "access"}]}).
+        Runs only once per database; later calls are no-ops.
+        """
+        if not os.path.exists(json_path):
+            return
+
+        conn = self._connection()
+        with conn:
+            # BEGIN IMMEDIATE so only one worker performs the migration
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'users_json_migrated'").fetchone():
+                return
+
+            try:
+                with open(json_path, 'r') as f:
+                    users = json.load(f).get('users', [])
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Error reading {json_path} for migration: {e}")
+                users = []
+
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (email, access) VALUES (?, ?)",
+                [(user['email'], 1 if user.get('access', True) else 0) for user in users if user.get('email')]
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('users_json_migrated', ?)", (json_path,))
+            print(f"Migrated {len(users)} users from {json_path}")
+
+    def has_access(self, email):
+        """Check whether an email has been granted access."""
+        if not email:
+            return False
+        row = self._connection().execute("SELECT access FROM users WHERE email = ?", (email,)).fetchone()
+        return bool(row and row[0])
+
+    def grant_access(self, email):
+        """Grant access to an email. Registering an existing email is a no-op."""
+        if not email:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO users (email, access) VALUES (?, 1)", (email,))
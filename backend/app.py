@@ -1,10 +1,16 @@
-from flask import Flask, jsonify, request, send_file
-import json
+from flask import Flask, jsonify, request, send_file, g, Response
 import os
+import time
 import stripe
 from flask_cors import CORS
 from dotenv import load_dotenv
-import csv
+import dataset_cache
+import ideas_query
+import idea_search
+import idea_table
+import metrics
+from access_store import AccessStore
+from idea_store import IdeaStore
 
 # Load environment variables
 load_dotenv()
@@ -30,25 +36,12 @@ CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
 # Configure Stripe
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
-# Define data directory - use persistent disk on Render if available
-DATA_DIR = '/data' if os.path.exists('/data') else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+# Define data directory - DATA_DIR overrides it, otherwise use persistent disk on Render if available
+DATA_DIR = os.getenv('DATA_DIR') or ('/data' if os.path.exists('/data') else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'))
 
 # Ensure data directories exist
 os.makedirs(os.path.join(DATA_DIR, 'csv'), exist_ok=True)
 
-# Helper functions
-def load_users():
-    file_path = os.path.join(DATA_DIR, 'users.json')
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    return {"users": []}
-
-def save_users(users):
-    file_path = os.path.join(DATA_DIR, 'users.json')
-    with open(file_path, 'w') as f:
-        json.dump(users, f)
-
 # Helper to copy files from repository to persistent storage on first run
 def initialize_data_files():
     # Copy SaaS_ideas.json if it doesn't exist in persistent storage
@@ -66,20 +59,45 @@ def initialize_data_files():
     if not os.path.exists(persistent_csv_path) and os.path.exists(repo_csv_path):
         with open(repo_csv_path, 'r') as src, open(persistent_csv_path, 'w') as dst:
             dst.write(src.read())
-            
-    # Initialize users.json if needed
-    if not os.path.exists(os.path.join(DATA_DIR, 'users.json')):
-        with open(os.path.join(DATA_DIR, 'users.json'), 'w') as f:
-            f.write('{"users": []}')
 
 # Initialize data on startup
 initialize_data_files()
 
+# Access store - users.json from earlier deployments is imported once
+access_store = AccessStore(os.path.join(DATA_DIR, 'users.db'), os.path.join(DATA_DIR, 'users.json'))
+
+# Metrics - the pipeline writes its metrics as *.prom files into METRICS_DIR, served together with the app's
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(DATA_DIR, 'metrics'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # if set, /api/metrics requires "Authorization: Bearer <token>"
+request_latency = metrics.histogram('http_request_seconds', "Duration of API requests", ['method', 'route', 'status'])
+payment_intents = metrics.counter('stripe_payment_intents_total', "Stripe payment intents by result", ['result'])
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_latency.observe(time.perf_counter() - start, method=request.method, route=route, status=response.status_code)
+    return response
+
 # Health check endpoint for Render
 @app.route('/api/health')
 def health_check():
     return jsonify({"status": "healthy"})
 
+# Prometheus scrape endpoint (each gunicorn worker reports its own request metrics)
+@app.route('/api/metrics')
+def get_metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    body = metrics.registry.render() + metrics.read_textfiles(METRICS_DIR)
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 # Routes
 @app.route('/api/preview-data')
 def get_preview_data():
@@ -87,21 +105,29 @@ def get_preview_data():
     
     # Check if user has access
     email = request.args.get('email')
-    has_access = False
+    has_access = access_store.has_access(email)
     
-    if email:
-        users = load_users()
-        has_access = email in [user['email'] for user in users['users']]
+    dataset = dataset_cache.get_dataset(file_path, dataset_cache.load_csv_rows)
     
-    with open(file_path, 'r') as f:
-        csv_reader = csv.DictReader(f)
-        data = list(csv_reader)
-        
-        # If user has access, return all data
-        if has_access:
-            return jsonify(data)
-        # Otherwise return only preview data
-        return jsonify(data[:8])  # Get first 8 entries
+    # If user has access, return all data
+    if has_access:
+        return dataset_cache.make_response(dataset, 'full', request)
+    # Otherwise return only preview data (first 8 entries)
+    return dataset_cache.make_response(dataset, 'preview', request)
+
+@app.route('/api/download-csv')
+def download_csv():
+    file_path = os.path.join(DATA_DIR, 'csv', 'SaaS_Niche_opportunities.csv')
+    
+    # The full CSV is only available to users with access
+    if not access_store.has_access(request.args.get('email')):
+        return jsonify({"error": "Access required"}), 403
+    
+    # conditional=True answers If-None-Match/If-Modified-Since with 304 Not Modified
+    response = send_file(file_path, mimetype='text/csv', as_attachment=True,
+                         download_name='SaaS_Niche_opportunities.csv', conditional=True, etag=True, max_age=0)
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/create-payment-intent', methods=['POST'])
 def create_payment():
@@ -115,6 +141,7 @@ def create_payment():
         )
         
         print(f"Payment intent created: {payment_intent.id}")
+        payment_intents.inc(result='created')
         print(f"Client secret: {payment_intent.client_secret[:5]}...")  # Only log part of it
         
         return jsonify({
@@ -122,6 +149,7 @@ def create_payment():
         })
     except Exception as e:
         print(f"Error creating payment intent: {str(e)}")
+        payment_intents.inc(result='error')
         # Return the error details for debugging
         return jsonify({
             'error': str(e),
@@ -132,9 +160,8 @@ def create_payment():
 def verify_access():
     data = request.json
     email = data.get('email')
-    users = load_users()
     
-    if email in [user['email'] for user in users['users']]:
+    if access_store.has_access(email):
         return jsonify({"hasAccess": True})
     return jsonify({"hasAccess": False})
 
@@ -143,22 +170,58 @@ def register_access():
     data = request.json
     email = data.get('email')
     
-    users = load_users()
-    if email not in [user['email'] for user in users['users']]:
-        users['users'].append({
-            "email": email,
-            "access": True
-        })
-        save_users(users)
+    access_store.grant_access(email)
     
     return jsonify({"success": True})
 
 @app.route('/api/saas-ideas')
 def get_saas_ideas():
     file_path = os.path.join(DATA_DIR, 'SaaS_ideas.json')
-    with open(file_path, 'r') as f:
-        saas_ideas = json.load(f)
-    return jsonify(saas_ideas)
+    dataset = dataset_cache.get_dataset(file_path, idea_table.load_json_table, ideas_query.IdeaIndex)
+    
+    # Without query parameters return the full array for backwards compatibility
+    if not any(param in request.args for param in ideas_query.QUERY_PARAMS):
+        return dataset_cache.make_response(dataset, 'full', request)
+    
+    try:
+        query = ideas_query.parse_query_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(dataset.index.query(**query))
+
+# Idea store written by the pipeline - its FTS index is updated with every appended idea
+IDEAS_DB_PATH = os.path.join(DATA_DIR, 'ideas.db')
+_idea_store = None
+
+def get_idea_store():
+    """Open the pipeline's idea store read-only on first use, or return None if there is none in DATA_DIR."""
+    global _idea_store
+    if _idea_store is None and os.path.exists(IDEAS_DB_PATH):
+        # The pipeline owns the schema, so app workers never write to the database
+        _idea_store = IdeaStore(IDEAS_DB_PATH, read_only=True)
+    return _idea_store
+
+@app.route('/api/search')
+def search_saas_ideas():
+    try:
+        query = idea_search.parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        store = get_idea_store()
+        if store is not None:
+            results = store.search(**query)
+        else:
+            # Deployments with only SaaS_ideas.json index it in memory once per file version
+            file_path = os.path.join(DATA_DIR, 'SaaS_ideas.json')
+            dataset = dataset_cache.get_dataset(file_path, idea_table.load_json_table, ideas_query.IdeaIndex)
+            results = dataset.index.search_index().search(**query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(results)
 
 if __name__ == '__main__':
     app.run(debug=True)
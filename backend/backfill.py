@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+Script to backfill ideas from historical Reddit posts and comments.
+
+Pages through the new or top submissions of each subreddit, loads their comment trees
+and feeds posts and comments through the same filter, batch, generation and enrichment
+stages as the live pipeline, without the live per-subreddit cooldown. Comments that
+were already processed (live or by an earlier backfill) are skipped, so an interrupted
+backfill can simply be run again.
+
+Example:
+    python backfill.py --subreddits SaaS,startups --since 2024-01-01 --until 2024-07-01
+"""
+
+import time
+import argparse
+from datetime import datetime, timezone
+import praw
+import prawcore
+import reddit_pipeline
+from checkpoint import SavedComment
+
+# Settings
+SUBMISSION_LIMIT = 1000  # Reddit listings stop after about 1000 submissions
+LISTING_PAGE_SIZE = 100  # submissions per listing request (Reddit's maximum)
+REPLACE_MORE_LIMIT = 32  # "load more comments" expansions per submission (each is one API request)
+MAX_RETRIES = 5  # retries for rate limited or failed Reddit requests
+RETRY_BACKOFF_BASE = 10  # seconds, doubled after every retry
+
+RETRYABLE_ERRORS = (
+    prawcore.exceptions.TooManyRequests,
+    prawcore.exceptions.ServerError,
+    prawcore.exceptions.RequestException,
+)
+
+
+def parse_date(value):
+    """Parse YYYY-MM-DD as a UTC timestamp."""
+    return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+
+
+def with_retries(function, description):
+    """
+    Call function, retrying rate limits and transient errors with exponential backoff.
+    praw already paces requests by Reddit's rate limit headers; this covers the failures.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return function()
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BACKOFF_BASE * (2 ** attempt)
+            print(f"Reddit request for {description} failed ({type(e).__name__}), retrying in {delay}s...")
+            time.sleep(delay)
+
+
+def fetch_listing_page(subreddit_instance, listing, time_filter, after):
+    """Fetch one page of a subreddit's new or top listing, starting after the given fullname."""
+    params = {'after': after} if after else {}
+    if listing == 'top':
+        return list(subreddit_instance.top(time_filter=time_filter, limit=LISTING_PAGE_SIZE, params=params))
+    return list(subreddit_instance.new(limit=LISTING_PAGE_SIZE, params=params))
+
+
+def iter_submissions(subreddit, listing, time_filter, since, until):
+    """
+    Yield submissions of a subreddit created within [since, until).
+
+    The listing is fetched page by page, each page with retries, so a rate limit or
+    transient error mid-listing resumes after the last submission seen instead of
+    ending the subreddit's backfill.
+    """
+    subreddit_instance = reddit_pipeline.reddit.subreddit(subreddit)
+    after = None
+    fetched = 0
+
+    while fetched < SUBMISSION_LIMIT:
+        page = with_retries(lambda: fetch_listing_page(subreddit_instance, listing, time_filter, after),
+                            f"r/{subreddit} {listing} listing after {after or 'the start'}")
+        if not page:
+            return
+
+        for submission in page:
+            created = submission.created_utc
+            if until is not None and created >= until:
+                continue
+            if since is not None and created < since:
+                if listing == 'new':
+                    return  # newest first, so everything after this is older
+                continue
+            yield submission
+
+        fetched += len(page)
+        after = page[-1].fullname
+
+
+def load_comments(submission):
+    """Load a submission's whole comment tree (up to REPLACE_MORE_LIMIT expansions)."""
+    submission.comments.replace_more(limit=REPLACE_MORE_LIMIT)
+    return [comment for comment in submission.comments.list() if isinstance(comment, praw.models.Comment)]
+
+
+def submission_as_comment(submission):
+    """Treat a post's title and text like a comment so it goes through the same stages."""
+    return SavedComment(
+        id=submission.fullname,  # fullname, because comment and submission ids can collide
+        fullname=submission.fullname,
+        subreddit=str(submission.subreddit),
+        body=f"{submission.title}\n\n{submission.selftext}".strip(),
+        created_utc=submission.created_utc,
+    )
+
+
+def backfill_subreddit(subreddit, args, since, until):
+    """
+    Feed one subreddit's historical posts and comments into the pipeline.
+
+    Returns:
+        Tuple of (submissions scanned, new comments queued)
+    """
+    submission_count = 0
+    queued = 0
+
+    for submission in iter_submissions(subreddit, args.listing, args.time_filter, since, until):
+        submission_count += 1
+        comments = with_retries(lambda: load_comments(submission), f"r/{subreddit} {submission.id}")
+        candidates = [submission_as_comment(submission)] + comments
+
+        new_ids = set(reddit_pipeline.processed_comments.filter_new([comment.id for comment in candidates]))
+        new_comments = [comment for comment in candidates if comment.id in new_ids]
+        queued += len(new_comments)
+
+        if not args.dry_run:
+            for comment in new_comments:
+                # Blocks while the generation stages catch up
+                reddit_pipeline.comment_pipeline.put(comment)
+
+        print(f"r/{subreddit}: submission {submission_count} ({submission.id}), "
+              f"{len(new_comments)} of {len(candidates)} posts/comments new")
+
+    return submission_count, queued
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill SaaS ideas from historical Reddit posts and comments.")
+    parser.add_argument('--subreddits', default=','.join(reddit_pipeline.SUBREDDITS),
+                        help="comma-separated subreddits (default: the pipeline's SUBREDDITS)")
+    parser.add_argument('--since', help="only submissions created on or after this date (YYYY-MM-DD, UTC)")
+    parser.add_argument('--until', help="only submissions created before this date (YYYY-MM-DD, UTC)")
+    parser.add_argument('--listing', choices=['new', 'top'], default='new', help="which submission listing to page through")
+    parser.add_argument('--time-filter', default='all', choices=['all', 'year', 'month', 'week', 'day'],
+                        help="time filter for --listing top")
+    parser.add_argument('--dry-run', action='store_true', help="count new posts and comments without generating ideas")
+    args = parser.parse_args()
+
+    since = parse_date(args.since) if args.since else None
+    until = parse_date(args.until) if args.until else None
+    subreddits = [name.strip() for name in args.subreddits.split(',') if name.strip()]
+
+    # The cooldown only thins out the live stream; a backfill uses every comment, and the
+    # generate stage blocks instead of dropping prompts when OpenAI falls behind
+    reddit_pipeline.COMMENT_COOLDOWN = 0
+    reddit_pipeline.comment_pipeline = reddit_pipeline.build_pipeline(bulk=True)
+    reddit_pipeline.comment_pipeline.start()
+
+    start = time.perf_counter()
+    total_submissions = 0
+    total_queued = 0
+    try:
+        for subreddit in subreddits:
+            try:
+                submissions, queued = backfill_subreddit(subreddit, args, since, until)
+            except (prawcore.exceptions.PrawcoreException, praw.exceptions.PRAWException) as e:
+                print(f"Error backfilling r/{subreddit}: {e}")
+                continue
+            total_submissions += submissions
+            total_queued += queued
+            print(f"Finished r/{subreddit}: {submissions} submissions, {queued} new posts/comments")
+    except KeyboardInterrupt:
+        print("Stopping backfill, finishing what is already queued...")
+
+    if not args.dry_run:
+        # Send the last partial prompt, wait for every stage, then enrich leftovers and export
+        reddit_pipeline.comment_pipeline['filter'].join()
+        reddit_pipeline.comment_pipeline['batch'].join()
+        reddit_pipeline.prompt_batcher.flush()
+        reddit_pipeline.comment_pipeline.join()
+        reddit_pipeline.process_keyword_batch()
+        reddit_pipeline.export_ideas(force=True)
+        reddit_pipeline.comment_pipeline.log_metrics()
+        print(f"OpenAI usage: {reddit_pipeline.openai_usage.summary()}")
+
+    print(f"Backfill scanned {total_submissions} submissions and queued {total_queued} new posts/comments "
+          f"in {time.perf_counter() - start:.0f}s.")
@@ -0,0 +1,584 @@
+#!/usr/bin/env python
+"""
+Script to benchmark the pipeline stages and API endpoints offline.
+
+Builds synthetic idea datasets shaped like data/SaaS_ideas_example.json, feeds a fake
+Reddit comment stream through the pipeline with a local stand-in for OpenAI and the
+DataForSEO stub server, and requests every API endpoint through Flask's test client.
+Everything runs in a temporary directory, so the real data files and APIs are never
+touched. Results (throughput, latency percentiles and memory per stage and endpoint)
+are written as JSON, and can be compared with the results of an earlier commit.
+
+Example:
+    python benchmark.py --sizes 1000,10000,100000 --output bench.json
+    python benchmark.py --sizes 1000 --baseline bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime, timezone
+from dataforseo_stub import start_stub_server
+
+# Settings
+DEFAULT_SIZES = [1000, 10000, 100000]  # ideas per synthetic dataset
+DEFAULT_COMMENTS = 2000  # fake Reddit comments per pipeline benchmark
+DEFAULT_PROMPTS = 20  # prompts sent to the fake OpenAI per generate benchmark
+DEFAULT_REQUESTS = 50  # requests per API endpoint
+IDEAS_PER_RESPONSE = 5  # ideas the fake OpenAI returns per prompt
+ENRICH_BATCH = 250  # ideas per keyword metrics batch, as BATCH_SIZE_FOR_KEYWORD_ANALYSIS
+REGRESSION_THRESHOLD = 0.2  # relative change reported when comparing with a baseline (runs vary by ~10%)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_IDEAS_PATH = os.path.join(REPO_DIR, 'data', 'SaaS_ideas_example.json')
+
+COMPETITION_LEVELS = ["Very Low", "Low", "Moderate", "High", "Very High"]
+FILLER_SENTENCES = [
+    "Honestly I've been looking for something like this for months.",
+    "We tried three different tools and none of them handled it well.",
+    "The biggest problem is that everything has to be done manually.",
+    "I would happily pay for a tool that automated this for our team.",
+    "Does anyone know a good way to keep track of this across clients?",
+    "Our spreadsheets are a mess and nobody trusts the numbers anymore.",
+]
+
+
+def load_templates(path=EXAMPLE_IDEAS_PATH):
+    """Load the example ideas used as templates for synthetic data."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def synthetic_ideas(count, templates, seed=0, missing_metrics_fraction=0.05):
+    """
+    Generate count ideas with the fields and value ranges of the example ideas.
+
+    Titles, descriptions and keywords are recombined from the templates so the text
+    has realistic length and vocabulary but ideas aren't exact copies.
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted({word.strip('.,:;()').lower() for template in templates
+                         for word in (template['product_title'] + ' ' + template['description']).split()
+                         if len(word) > 3})
+    keywords = sorted({keyword for template in templates for keyword in template.get('keywords', [])})
+
+    ideas = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        extra = rng.sample(vocabulary, 3)
+        idea = {
+            "product_title": f"{template['product_title']} {' '.join(word.title() for word in extra[:2])} {i}",
+            "description": f"{template['description']} Built for {' and '.join(extra)}.",
+            "keywords": rng.sample(keywords, 3) if len(keywords) >= 3 else list(template.get('keywords', [])),
+        }
+        if rng.random() < missing_metrics_fraction:
+            idea.update(avg_monthly_searches=None, competition_level=None, revenue=None)
+        else:
+            searches = int(10 ** rng.uniform(1, 5.5))
+            competition = rng.randrange(len(COMPETITION_LEVELS))
+            idea.update(
+                avg_monthly_searches=searches,
+                competition_level=COMPETITION_LEVELS[competition],
+                revenue=int(searches * 0.01 * 50 * (1 + searches / (searches + 1000)) * (1 - 0.05 * competition)),
+            )
+        ideas.append(idea)
+    return ideas
+
+
+def fake_comments(count, templates, seed=0, prefix='c'):
+    """
+    Generate a fake Reddit comment stream: mostly comments long enough to pass the filter,
+    mixed with short replies, bot comments and repeated text like a real subreddit.
+    """
+    from checkpoint import SavedComment
+
+    rng = random.Random(seed)
+    subreddits = ['SaaS', 'startups', 'Entrepreneur', 'technology', 'marketing']
+    comments = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            body = rng.choice(["Thanks!", "This.", "Same here, following.", "lol"])
+        elif roll < 0.13:
+            body = "I am a bot, and this action was performed automatically."
+        else:
+            template = rng.choice(templates)
+            sentences = rng.sample(FILLER_SENTENCES, 2)
+            body = f"{sentences[0]} {template['description']} {sentences[1]}"
+        comments.append(SavedComment(
+            id=f"{prefix}{seed}_{i}",
+            fullname=f"t1_{prefix}{seed}_{i}",
+            subreddit=rng.choice(subreddits),
+            body=body,
+            created_utc=time.time(),
+        ))
+    return comments
+
+
+class FakeOpenAI:
+    """
+    Stand-in for create_completion_with_backoff: answers after a fixed latency with a
+    deterministic JSON array of ideas derived from the prompt.
+    """
+
+    def __init__(self, templates, latency=0.0, ideas_per_response=IDEAS_PER_RESPONSE):
+        self.templates = templates
+        self.latency = latency
+        self.ideas_per_response = ideas_per_response
+        self.requests = 0
+
+    def __call__(self, **kwargs):
+        from types import SimpleNamespace
+
+        prompt = kwargs['messages'][-1]['content']
+        digest = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest(), 16)
+        rng = random.Random(digest)
+        ideas = []
+        for i in range(self.ideas_per_response):
+            template = rng.choice(self.templates)
+            ideas.append({
+                "product_title": f"{template['product_title']} for {rng.choice(['teams', 'agencies', 'creators', 'clinics'])} {digest % 100000}-{i}",
+                "description": template['description'],
+                "keywords": list(template.get('keywords', [])),
+            })
+        content = json.dumps(ideas)
+
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, total_seconds, items=None):
+    """
+    Summarize call latencies.
+
+    Parameters:
+        latencies: Seconds per call.
+        total_seconds: Wall time of all calls (differs from the sum for concurrent work).
+        items: Items processed, if calls process more than one item each (defaults to the call count).
+
+    Returns:
+        Dictionary of counts, throughput and latency percentiles in milliseconds
+    """
+    latencies = sorted(latencies)
+    items = len(latencies) if items is None else items
+    result = {
+        "calls": len(latencies),
+        "items": items,
+        "seconds": round(total_seconds, 6),
+        "items_per_second": round(items / total_seconds, 2) if total_seconds > 0 else None,
+    }
+    if latencies:
+        result["latency_ms"] = {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 4),
+            "p50": round(percentile(latencies, 0.5) * 1000, 4),
+            "p95": round(percentile(latencies, 0.95) * 1000, 4),
+            "p99": round(percentile(latencies, 0.99) * 1000, 4),
+            "max": round(latencies[-1] * 1000, 4),
+        }
+    return result
+
+
+def max_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB, macOS bytes)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Recorder:
+    """Runs benchmark cases and collects their results, with memory use per case."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    @contextlib.contextmanager
+    def case(self, group, name):
+        """Measure the memory of the with block; the block stores its timings in the yielded dict."""
+        result = {}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        yield result
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            result["memory_mb"] = {
+                "peak_above_start": round((peak - before) / (1024 * 1024), 3),
+                "retained": round((current - before) / (1024 * 1024), 3),
+            }
+        result["max_rss_mb"] = max_rss_mb()
+        self.results.setdefault(group, {})[name] = result
+        print(f"  {group}/{name}: {json.dumps({k: v for k, v in result.items() if k != 'max_rss_mb'})}", file=sys.stderr)
+
+    def calls(self, group, name, calls, items=None):
+        """Time a list of zero-argument calls one after another."""
+        with self.case(group, name) as result:
+            latencies = []
+            start = time.perf_counter()
+            for call in calls:
+                call_start = time.perf_counter()
+                call()
+                latencies.append(time.perf_counter() - call_start)
+            result.update(summarize(latencies, time.perf_counter() - start, items))
+
+
+def import_modules(work_dir, stub_url):
+    """
+    Import the pipeline and the app with every data file in work_dir and DataForSEO
+    pointed at the stub, so nothing touches the real data directory or external APIs.
+
+    Returns:
+        Tuple of (reddit_pipeline module, app module)
+    """
+    os.makedirs(os.path.join(work_dir, 'data', 'csv'), exist_ok=True)
+    os.chdir(work_dir)  # paths.get_data_dir() is relative to the working directory
+    for name in ('REDDIT_CLIENT_ID', 'REDDIT_CLIENT_SECRET', 'REDDIT_USER_AGENT', 'OPENAI_API_KEY'):
+        os.environ.setdefault(name, 'benchmark')
+    # Set before the modules call load_dotenv, which doesn't override existing variables
+    os.environ.update({
+        'DATAFORSEO_API_URL': stub_url,
+        'DATAFORSEO_USERNAME': 'stub',
+        'DATAFORSEO_PASSWORD': 'stub',
+        'METRICS_DIR': os.path.join(work_dir, 'data', 'metrics'),
+        # The app opens users.db and copies data files into its DATA_DIR on import
+        'DATA_DIR': os.path.join(work_dir, 'data'),
+    })
+    os.environ.pop('METRICS_TOKEN', None)
+
+    import reddit_pipeline
+    import app
+    return reddit_pipeline, app
+
+
+def use_dataset(rp, app, ideas, directory):
+    """Write a dataset to a fresh directory and point the pipeline and the app at it."""
+    import json_to_csv
+    import google_ads_metrics
+    from keyword_cache import KeywordCache
+    from llm_cache import LLMResponseCache
+    from processed_comments import ProcessedComments
+    from access_store import AccessStore
+
+    os.makedirs(os.path.join(directory, 'csv'), exist_ok=True)
+    json_path = os.path.join(directory, 'SaaS_ideas.json')
+    csv_path = os.path.join(directory, 'csv', 'SaaS_Niche_opportunities.csv')
+    with open(json_path, 'w') as f:
+        json.dump(ideas, f, indent=2)
+    json_to_csv.write_csv(ideas, csv_path)
+
+    rp.IDEAS_JSON_PATH = json_path
+    rp.idea_deduplicator = None
+    rp.last_export_time = 0
+    # An export deferred while benchmarking the previous dataset would write into its deleted directory
+    if rp.export_timer is not None:
+        rp.export_timer.cancel()
+        rp.export_timer = None
+    rp.processed_comments = ProcessedComments(os.path.join(directory, 'processed_comments.db'))
+    rp.llm_cache = LLMResponseCache(os.path.join(directory, 'llm_cache.db'), rp.LLM_CACHE_MAX_MB * 1024 * 1024)
+    google_ads_metrics.keyword_cache = KeywordCache(os.path.join(directory, 'keyword_cache.db'), ttl_seconds=30 * 24 * 60 * 60)
+    # json_to_csv.json_to_csv always writes into the data directory of the working directory
+    json_to_csv.json_to_csv = lambda saas_ideas=None: json_to_csv.write_csv(saas_ideas, csv_path)
+
+    app.DATA_DIR = directory
+    app.IDEAS_DB_PATH = os.path.join(directory, 'ideas.db')
+    app._idea_store = None
+    app.access_store = AccessStore(os.path.join(directory, 'users.db'))
+    app.access_store.grant_access('benchmark@example.com')
+
+
+def bench_pipeline(recorder, rp, templates, size, args):
+    """Benchmark each pipeline stage's handler on its own, then the whole staged pipeline."""
+    from idea_store import IdeaStore
+    from prompt_batcher import PromptBatcher
+
+    group = f"{size}/pipeline"
+    rp.COMMENT_COOLDOWN = 0
+    fake_openai = FakeOpenAI(templates, latency=args.openai_latency)
+    rp.create_completion_with_backoff = fake_openai
+
+    # The dataset's SaaS_ideas.json is imported into a new idea store, as on a first run
+    with recorder.case(group, 'store_import') as result:
+        start = time.perf_counter()
+        rp.idea_store = IdeaStore(os.path.join(os.path.dirname(rp.IDEAS_JSON_PATH), 'ideas.db'), rp.IDEAS_JSON_PATH)
+        elapsed = time.perf_counter() - start
+        result.update(summarize([elapsed], elapsed, size))
+
+    with recorder.case(group, 'dedup_index_build') as result:
+        start = time.perf_counter()
+        rp.get_idea_deduplicator()
+        elapsed = time.perf_counter() - start
+        result.update(summarize([elapsed], elapsed, size))
+
+    comments = fake_comments(args.comments, templates, seed=size, prefix='filter')
+    scored = []
+    recorder.calls(group, 'filter', [lambda comment=comment: scored.append(rp.process_comment(comment)) for comment in comments])
+    scored = [item for item in scored if item]
+
+    prompts = []
+    batcher = PromptBatcher(prompts.append, rp.PROMPT_TOKEN_BUDGET, rp.PROMPT_MAX_LATENCY,
+                            candidate_factor=rp.PROMPT_CANDIDATE_FACTOR)
+    recorder.calls(group, 'batch', [lambda item=item: batcher.add(item[1], item[0]) for item in scored])
+
+    # Unique prompts, so every call is a cache miss that reaches the fake OpenAI
+    generate_prompts = [f"{prompts[i % len(prompts)] if prompts else ''}\n\n(prompt {size}-{i})"
+                        for i in range(args.prompts)]
+    generated = []
+    recorder.calls(group, 'generate', [lambda prompt=prompt: generated.append(rp.generate_ideas(prompt) or [])
+                                       for prompt in generate_prompts])
+    recorder.calls(group, 'generate_cached', [lambda prompt=prompt: rp.generate_ideas(prompt) for prompt in generate_prompts])
+
+    # Exports are measured on their own below (the forced export cancels the deferred one)
+    export_interval = rp.EXPORT_INTERVAL
+    rp.EXPORT_INTERVAL = 24 * 60 * 60
+    rp.last_export_time = time.time()
+    new_ideas = synthetic_ideas(args.prompts * IDEAS_PER_RESPONSE, templates, seed=size + 1)
+    for idea in new_ideas:
+        idea['product_title'] = f"New {idea['product_title']}"
+    idea_batches = [new_ideas[i:i + IDEAS_PER_RESPONSE] for i in range(0, len(new_ideas), IDEAS_PER_RESPONSE)]
+    recorder.calls(group, 'persist', [lambda batch=batch: rp.persist_ideas(batch) for batch in idea_batches],
+                   items=len(new_ideas))
+    rp.EXPORT_INTERVAL = export_interval
+
+    recorder.calls(group, 'export', [lambda: rp.export_ideas(force=True) for _ in range(3)], items=3 * (size + len(new_ideas)))
+
+    # Stored ideas with ids, as the enrich stage receives them
+    stored = list(rp.idea_store.iter_ideas(include_id=True))[:ENRICH_BATCH * 2]
+    enrich_batches = [stored[i:i + ENRICH_BATCH] for i in range(0, len(stored), ENRICH_BATCH)]
+    recorder.calls(group, 'enrich', [lambda batch=batch: rp.process_keyword_batch(batch) for batch in enrich_batches],
+                   items=len(stored))
+    recorder.calls(group, 'enrich_cached', [lambda batch=batch: rp.process_keyword_batch(batch) for batch in enrich_batches],
+                   items=len(stored))
+
+    # The whole staged pipeline, drained like the backfill command does
+    with recorder.case(group, 'end_to_end') as result:
+        requests_before = fake_openai.requests
+        stored_before = rp.idea_store.count()
+        rp.comment_pipeline = rp.build_pipeline(bulk=True).start()
+        stream = fake_comments(args.comments, templates, seed=size + 2, prefix='stream')
+
+        start = time.perf_counter()
+        for comment in stream:
+            rp.comment_pipeline.put(comment)
+        rp.comment_pipeline['filter'].join()
+        rp.comment_pipeline['batch'].join()
+        rp.prompt_batcher.flush()
+        rp.comment_pipeline.join()
+        rp.process_keyword_batch()
+        elapsed = time.perf_counter() - start
+
+        result.update(summarize([], elapsed, len(stream)))
+        result["openai_requests"] = fake_openai.requests - requests_before
+        result["ideas_stored"] = rp.idea_store.count() - stored_before
+        result["stages"] = {
+            name: {key: round(value, 6) if isinstance(value, float) else value for key, value in stage.items()}
+            for name, stage in rp.comment_pipeline.metrics().items()
+        }
+
+
+def bench_api(recorder, app, size, args):
+    """Benchmark the API endpoints through Flask's test client, cold (first load) and warm."""
+    import dataset_cache
+
+    group = f"{size}/api"
+    client = app.app.test_client()
+    email = 'benchmark@example.com'
+    endpoints = [
+        ('saas_ideas_full', '/api/saas-ideas', {'Accept-Encoding': 'identity'}),
+        ('saas_ideas_full_br', '/api/saas-ideas', {'Accept-Encoding': 'br, gzip'}),
+        ('saas_ideas_full_gzip', '/api/saas-ideas', {'Accept-Encoding': 'gzip'}),
+        ('saas_ideas_page', '/api/saas-ideas?sort=revenue&order=desc&page=2&limit=50', {}),
+        ('saas_ideas_filter', '/api/saas-ideas?q=ai&competition=Low,Moderate&min_searches=1000&sort=competition_level', {}),
+        ('search', '/api/search?q=compliance%20tracking&limit=20', {}),
+        ('search_prefix', '/api/search?q=pro&limit=20', {}),
+        ('preview_data', '/api/preview-data', {}),
+        ('preview_data_full', f'/api/preview-data?email={email}', {}),
+        ('download_csv', f'/api/download-csv?email={email}', {}),
+        ('metrics', '/api/metrics', {}),
+        ('health', '/api/health', {}),
+    ]
+
+    # Drop datasets cached for an earlier size, so the first request loads and indexes this one
+    dataset_cache._datasets.clear()
+
+    # /api/search reads the pipeline's idea store; without a pipeline run, import the dataset into one
+    if not os.path.exists(app.IDEAS_DB_PATH):
+        from idea_store import IdeaStore
+        IdeaStore(app.IDEAS_DB_PATH, os.path.join(app.DATA_DIR, 'SaaS_ideas.json'))
+
+    def request(path, headers):
+        response = client.get(path, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned HTTP {response.status_code}")
+        response.get_data()
+        return response
+
+    for name, path, headers in endpoints:
+        with recorder.case(group, name) as result:
+            start = time.perf_counter()
+            response = request(path, headers)
+            result["cold_ms"] = round((time.perf_counter() - start) * 1000, 4)
+            result["response_bytes"] = len(response.get_data())
+
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                call_start = time.perf_counter()
+                request(path, headers)
+                latencies.append(time.perf_counter() - call_start)
+            result.update(summarize(latencies, time.perf_counter() - start))
+
+
+def git_commit():
+    """Commit hash of the working tree (with '-dirty' for uncommitted changes), if available."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare throughput and median latency with a baseline result file.
+
+    Returns:
+        List of changes larger than threshold, as dictionaries with the case, metric, both values and the ratio
+    """
+    changes = []
+    for group, cases in results.items():
+        for name, current in cases.items():
+            previous = baseline.get('results', {}).get(group, {}).get(name)
+            if not previous:
+                continue
+            metrics = [('items_per_second', current.get('items_per_second'), previous.get('items_per_second'), True),
+                       ('p50_ms', current.get('latency_ms', {}).get('p50'), previous.get('latency_ms', {}).get('p50'), False)]
+            for metric, new, old, higher_is_better in metrics:
+                if not new or not old:
+                    continue
+                ratio = new / old
+                if abs(ratio - 1) > threshold:
+                    improved = ratio > 1 if higher_is_better else ratio < 1
+                    changes.append({
+                        "case": f"{group}/{name}",
+                        "metric": metric,
+                        "baseline": old,
+                        "current": new,
+                        "ratio": round(ratio, 3),
+                        "change": "improvement" if improved else "regression",
+                    })
+    return changes
+
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    templates = load_templates()
+    recorder = Recorder(trace_memory=args.memory)
+    if args.memory:
+        tracemalloc.start()
+
+    stub_server, stub_url = start_stub_server(latency=args.dataforseo_latency)
+    work_dir = tempfile.mkdtemp(prefix='saas-benchmark-')
+    original_cwd = os.getcwd()
+    # The modules log every comment and idea; keep that out of the results
+    log = sys.stderr if args.verbose else open(os.devnull, 'w')
+
+    try:
+        with contextlib.redirect_stdout(log):
+            rp, app = import_modules(work_dir, stub_url)
+            for size in sizes:
+                print(f"Benchmarking {size} ideas...", file=sys.stderr)
+                ideas = synthetic_ideas(size, templates, seed=size)
+                use_dataset(rp, app, ideas, os.path.join(work_dir, f"ideas_{size}"))
+                if 'pipeline' in args.only:
+                    bench_pipeline(recorder, rp, templates, size, args)
+                if 'api' in args.only:
+                    bench_api(recorder, app, size, args)
+    finally:
+        os.chdir(original_cwd)
+        stub_server.shutdown()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "comments": args.comments,
+            "prompts": args.prompts,
+            "requests": args.requests,
+            "openai_latency": args.openai_latency,
+            "dataforseo_latency": args.dataforseo_latency,
+            # tracemalloc slows Python code down, so compare timings only between runs with the same setting
+            "memory_traced": args.memory,
+        },
+        "results": recorder.results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages and API endpoints offline.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated numbers of ideas in the synthetic datasets")
+    parser.add_argument('--only', default='pipeline,api', help="comma-separated benchmark groups: pipeline, api")
+    parser.add_argument('--comments', type=int, default=DEFAULT_COMMENTS, help="fake comments per pipeline benchmark")
+    parser.add_argument('--prompts', type=int, default=DEFAULT_PROMPTS, help="prompts per generate benchmark")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help="requests per endpoint")
+    parser.add_argument('--openai-latency', type=float, default=0.0, help="seconds the fake OpenAI takes per request")
+    parser.add_argument('--dataforseo-latency', type=float, default=0.0, help="seconds the DataForSEO stub takes per request")
+    parser.add_argument('--memory', action='store_true', help="trace Python allocations per case (slows down timings)")
+    parser.add_argument('--output', help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="relative change reported in the comparison (default 0.2)")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary data directory")
+    parser.add_argument('--verbose', action='store_true', help="show the pipeline's log output on stderr")
+    args = parser.parse_args()
+    args.only = {group.strip() for group in args.only.split(',')}
+
+    report = run(args)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        report["comparison"] = {
+            "baseline_commit": baseline.get('meta', {}).get('commit'),
+            "threshold": args.threshold,
+            "changes": compare(report["results"], baseline, args.threshold),
+        }
+        for change in report["comparison"]["changes"]:
+            print(f"{change['change']}: {change['case']} {change['metric']} "
+                  f"{change['baseline']} -> {change['current']} (x{change['ratio']})", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Wrote benchmark results to {args.output}", file=sys.stderr)
+    else:
+        print(output)
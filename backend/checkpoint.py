@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import namedtuple
+import metrics
+
+CHECKPOINT_INTERVAL = 30  # seconds between checkpoint writes while the pipeline runs
+
+file_write_seconds = metrics.histogram('file_write_seconds', "Duration of data file writes", ['file'])
+
+# The attributes of a praw comment the pipeline uses, so buffered comments can be saved and restored
+SavedComment = namedtuple('SavedComment', ['id', 'fullname', 'subreddit', 'body', 'created_utc'])
+
+
+def save_comment(comment):
+    """Convert a praw comment into a JSON-serializable dictionary of SavedComment fields."""
+    return {
+        "id": comment.id,
+        "fullname": comment.fullname,
+        "subreddit": str(comment.subreddit),
+        "body": comment.body,
+        "created_utc": float(getattr(comment, 'created_utc', 0) or 0),
+    }
+
+
+class Checkpoint:
+    """
+    Small JSON file with the pipeline's resumable state: the newest comment seen per
+    subreddit and whatever work is buffered in memory (comments, prompts, ideas).
+
+    The file is replaced atomically and only rewritten when its content changes.
+    """
+
+    def __init__(self, path, snapshot=None, interval=CHECKPOINT_INTERVAL):
+        """
+        Parameters:
+            path: Location of the checkpoint file.
+            snapshot: Function returning a JSON-serializable dictionary of buffered work.
+            interval: Seconds between writes by the background thread.
+        """
+        self.path = path
+        self.snapshot = snapshot
+        self.interval = interval
+        self.last_seen = {}  # lowercased subreddit -> {"fullname", "created_utc"}
+        self.restored = {}
+        self._last_written = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.load()
+
+    def load(self):
+        """Load the checkpoint file, if any. Buffered work is kept in self.restored."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error reading checkpoint {self.path}: {e}. Starting fresh.")
+            return
+        self.last_seen = state.get('last_seen', {})
+        self.restored = state.get('pending', {})
+        print(f"Loaded checkpoint from {self.path} (saved {time.ctime(state.get('saved_at', 0))})")
+
+    def mark_seen(self, comment):
+        """Remember a comment as the newest processed one of its subreddit, if it is newer."""
+        subreddit = str(comment.subreddit).lower()
+        created = float(getattr(comment, 'created_utc', 0) or 0)
+        with self._lock:
+            current = self.last_seen.get(subreddit)
+            if current is None or created >= current['created_utc']:
+                self.last_seen[subreddit] = {"fullname": comment.fullname, "created_utc": created}
+
+    def is_new(self, comment):
+        """Whether a comment is newer than the checkpoint of its subreddit."""
+        current = self.last_seen.get(str(comment.subreddit).lower())
+        if current is None:
+            return True
+        # Comments only have second resolution, so the same second counts as new (duplicates
+        # are caught by the comment filter)
+        return float(getattr(comment, 'created_utc', 0) or 0) >= current['created_utc'] and comment.fullname != current['fullname']
+
+    def has_position(self, subreddits):
+        """Whether any of the subreddits has a recorded position to resume from."""
+        return any(name.lower() in self.last_seen for name in subreddits)
+
+    def save(self):
+        """Write the checkpoint if it changed since the last write."""
+        pending = self.snapshot() if self.snapshot else {}
+        with self._lock:
+            last_seen = dict(self.last_seen)
+        state = {"last_seen": last_seen, "pending": pending}
+        content = json.dumps(state, sort_keys=True)
+        if content == self._last_written:
+            return False
+
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint.', suffix='.tmp')
+        try:
+            with file_write_seconds.time(file=os.path.basename(self.path)):
+                with os.fdopen(fd, 'w') as f:
+                    # saved_at isn't compared, so an idle pipeline doesn't rewrite the file
+                    json.dump(dict(state, saved_at=time.time()), f)
+                os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._last_written = content
+        return True
+
+    def start(self):
+        """Start a daemon thread saving the checkpoint every interval seconds."""
+        if self._thread is not None:
+            return self._thread
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.save()
+                except Exception as e:
+                    print(f"Error saving checkpoint: {e}")
+
+        self._thread = threading.Thread(target=run, name="checkpoint", daemon=True)
+        self._thread.start()
+        return self._thread
@@ -0,0 +1,165 @@
+import re
+import pickle
+import zlib
+import threading
+from collections import deque
+
+# Settings
+MIN_ENGLISH_RATIO = 0.15  # share of words that must be common English words
+SIMHASH_MAX_DISTANCE = 7  # comments whose SimHashes differ in at most this many bits are near-duplicates
+RECENT_COMMENT_HASHES = 5000  # number of recent comments remembered for near-duplicate detection
+CLASSIFIER_WEIGHT = 3.0  # score added for a classifier probability of 1.0
+
+# Phrases that signal a pain point, an unmet need or willingness to pay, with their weights
+SIGNAL_PATTERNS = [
+    (r"\bi wish (there was|there were|i could|someone would)\b", 3.0),
+    (r"\b(is there|are there) (a|an|any) (tool|app|software|service|way|platform|website|saas)\b", 3.0),
+    (r"\blooking for (a|an|some) (tool|app|software|service|solution|platform|way)\b", 3.0),
+    (r"\bwould (happily |gladly )?pay\b|\bshut up and take my money\b", 3.0),
+    (r"\b(alternative|alternatives) to\b", 2.0),
+    (r"\bany (recommendations|suggestions)\b", 1.5),
+    (r"\b(frustrat\w*|annoy\w*|tedious|painful|nightmare|pain in the)\b", 1.5),
+    (r"\b(struggl\w*|can'?t find|couldn'?t find|no good way)\b", 1.5),
+    (r"\b(i|we) hate (it )?(when|that|how)\b", 1.5),
+    (r"\b(takes|took|wasting|waste of) (forever|hours|so much time|time)\b", 1.5),
+    (r"\b(manually|by hand|spreadsheets?|copy and paste|workaround)\b", 1.0),
+    (r"\b(too expensive|overpriced|costs? too much)\b", 1.0),
+    (r"\b(automate|automating|automation)\b", 1.0),
+    (r"\b(our|my) (team|company|clients|customers|business)\b", 0.5),
+]
+
+# Phrases typical of comments that won't produce ideas
+NOISE_PATTERNS = [
+    (r"\b(thanks for sharing|great post|this is the way|underrated comment|came here to say)\b", -2.0),
+    (r"\b(lol|lmao|rofl)\b", -1.0),
+    (r"https?://", -1.0),
+]
+
+# Most frequent English words, used for a dependency-free language check
+ENGLISH_WORDS = {
+    'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it', 'for', 'not', 'on', 'with',
+    'he', 'as', 'you', 'do', 'at', 'this', 'but', 'his', 'by', 'from', 'they', 'we', 'say', 'her',
+    'she', 'or', 'an', 'will', 'my', 'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up',
+    'out', 'if', 'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can', 'like', 'time',
+    'no', 'just', 'him', 'know', 'take', 'people', 'into', 'year', 'your', 'good', 'some', 'could',
+    'them', 'see', 'other', 'than', 'then', 'now', 'look', 'only', 'come', 'its', 'over', 'think',
+    'also', 'use', 'how', 'our', 'work', 'is', 'are', 'was', 'been', 'has', 'had', 'any', 'more',
+    'need', 'want', 'because', 'way', 'even', 'really', 'much', 'very', 'don\'t', 'i\'m', 'it\'s',
+}
+
+_SIGNAL_RES = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in SIGNAL_PATTERNS + NOISE_PATTERNS]
+_WORD_RE = re.compile(r"[a-z']+")
+_SHINGLE_SIZE = 3
+
+
+def english_ratio(words):
+    """Share of words that are among the most common English words."""
+    if not words:
+        return 0.0
+    return sum(1 for word in words if word in ENGLISH_WORDS) / len(words)
+
+
+def heuristic_score(text):
+    """Sum of the weights of all signal and noise phrases found in text."""
+    return sum(weight for pattern, weight in _SIGNAL_RES if pattern.search(text))
+
+
+def simhash(words):
+    """
+    64-bit SimHash of a comment's word 3-shingles. Comments that differ only in a few
+    words (quotes, reposts, templated replies) end up a few bits apart.
+    """
+    shingles = [' '.join(words[i:i + _SHINGLE_SIZE]) for i in range(max(len(words) - _SHINGLE_SIZE + 1, 1))]
+    counts = [0] * 64
+    for shingle in shingles:
+        encoded = shingle.encode('utf-8')
+        value = (zlib.crc32(encoded) << 32) | zlib.adler32(encoded)
+        for bit in range(64):
+            counts[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if counts[bit] > 0)
+
+
+def load_classifier(model_path):
+    """
+    Load a pickled classifier with a scikit-learn style predict_proba (e.g. a
+    TfidfVectorizer + LogisticRegression pipeline trained on comments that did or
+    didn't produce ideas) and wrap it as a text -> probability function.
+    """
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    return lambda text: float(model.predict_proba([text])[0][1])
+
+
+class CommentFilter:
+    """
+    Cheap local scoring of Reddit comments before they are sent to OpenAI.
+
+    Comments that aren't English or nearly repeat a recent comment are rejected outright;
+    the rest get a score from phrase heuristics plus an optional classifier, which is used
+    to rank buffered comments (see prompt_batcher.PromptBatcher).
+    """
+
+    def __init__(self, classifier=None):
+        """
+        Parameters:
+            classifier: Optional function text -> probability (0-1) that the comment
+                contains a usable SaaS idea.
+        """
+        self.classifier = classifier
+        self.recent_hashes = deque()
+        # SimHash split into SIMHASH_MAX_DISTANCE + 1 bands: two hashes that differ in at most
+        # SIMHASH_MAX_DISTANCE bits agree on at least one band, so only hashes sharing a band
+        # have to be compared
+        self.band_count = SIMHASH_MAX_DISTANCE + 1
+        self.band_bits = 64 // self.band_count
+        self.band_index = [{} for _ in range(self.band_count)]
+        self._lock = threading.Lock()
+
+    def _bands(self, value):
+        mask = (1 << self.band_bits) - 1
+        return [(band, value >> (self.band_bits * band) & mask) for band in range(self.band_count)]
+
+    def _is_near_duplicate(self, value):
+        """Check value against recent hashes and remember it. Call with the lock held."""
+        for band, key in self._bands(value):
+            for other in self.band_index[band].get(key, ()):
+                if bin(value ^ other).count('1') <= SIMHASH_MAX_DISTANCE:
+                    return True
+
+        self.recent_hashes.append(value)
+        for band, key in self._bands(value):
+            self.band_index[band].setdefault(key, []).append(value)
+
+        if len(self.recent_hashes) > RECENT_COMMENT_HASHES:
+            oldest = self.recent_hashes.popleft()
+            for band, key in self._bands(oldest):
+                bucket = self.band_index[band][key]
+                bucket.remove(oldest)
+                if not bucket:
+                    del self.band_index[band][key]
+        return False
+
+    def score(self, text):
+        """
+        Score a comment.
+
+        Returns:
+            Tuple of (score, None) for a candidate comment, or (None, reason) if it was rejected
+        """
+        words = _WORD_RE.findall(text.lower())
+        if english_ratio(words) < MIN_ENGLISH_RATIO:
+            return None, "not English"
+
+        value = simhash(words)
+        with self._lock:
+            if self._is_near_duplicate(value):
+                return None, "near-duplicate"
+
+        score = heuristic_score(text)
+        if self.classifier:
+            try:
+                score += CLASSIFIER_WEIGHT * self.classifier(text)
+            except Exception as e:
+                print(f"Comment classifier failed: {e}")
+        return score, None
+
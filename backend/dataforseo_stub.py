@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the DataForSEO API (live and task_post/task_get search volume
+endpoints), for offline testing and benchmarking.
+
+Run it and point the client at it:
+    python dataforseo_stub.py --port 8765
+    DATAFORSEO_API_URL=http://localhost:8765 DATAFORSEO_USERNAME=stub DATAFORSEO_PASSWORD=stub python generate_metrics.py
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_keyword_result(keyword):
+    """Deterministic, plausible-looking search volume result for a keyword."""
+    digest = int(hashlib.sha1(keyword.encode('utf-8')).hexdigest(), 16)
+    search_volume = (digest % 50) * 10 ** (digest % 4)  # 0 .. 49,000, some zeros
+    competition_index = digest % 101
+    competition = "LOW" if competition_index < 34 else "MEDIUM" if competition_index < 67 else "HIGH"
+    return {
+        "keyword": keyword.lower(),
+        "search_volume": search_volume,
+        "competition": competition,
+        "competition_index": competition_index,
+        "monthly_searches": [
+            {"year": 2024, "month": month, "search_volume": search_volume} for month in range(1, 13)
+        ],
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers the DataForSEO endpoints used by google_ads_metrics."""
+
+    # Set by start_stub_server
+    latency = 0.0
+    failure_rate = 0.0
+    task_delay = 0.0
+    tasks = {}  # task id -> (ready_at, keywords)
+    collected = set()  # ids already fetched with task_get - no longer listed by tasks_ready
+    request_count = 0
+    keyword_count = 0
+    _count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _simulate_conditions(self):
+        """Apply configured latency and random failures. Returns False if the request failed."""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self._send_json(500, {"status_code": 50000, "status_message": "Internal Error."})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._simulate_conditions():
+            return
+
+        prefix = '/v3/keywords_data/google_ads/search_volume/'
+        now = time.time()
+
+        if self.path == prefix + 'tasks_ready':
+            ready = [{"id": task_id} for task_id, (ready_at, _) in list(StubHandler.tasks.items())
+                     if ready_at <= now and task_id not in StubHandler.collected]
+            self._send_json(200, {"status_code": 20000, "tasks": [{"status_code": 20000, "result": ready}]})
+        elif self.path.startswith(prefix + 'task_get/'):
+            task_id = self.path.rsplit('/', 1)[-1]
+            ready_at, keywords = StubHandler.tasks.get(task_id, (None, None))
+            if ready_at is None:
+                self._send_json(200, {"status_code": 20000, "tasks": [{"id": task_id, "status_code": 40400, "status_message": "Not Found."}]})
+                return
+            if ready_at > now:
+                self._send_json(200, {"status_code": 20000, "tasks": [{"id": task_id, "status_code": 40602, "status_message": "Task In Queue."}]})
+                return
+            # Like the real API, results stay available after the first task_get
+            StubHandler.collected.add(task_id)
+            self._send_json(200, {"status_code": 20000, "tasks": [{
+                "id": task_id,
+                "status_code": 20000,
+                "status_message": "Ok.",
+                "result": [fake_keyword_result(keyword) for keyword in keywords],
+            }]})
+        else:
+            self._send_json(404, {"status_code": 40400, "status_message": "Not Found."})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'[]')
+
+        if not self._simulate_conditions():
+            return
+
+        if self.path == '/v3/keywords_data/google_ads/search_volume/task_post':
+            tasks = []
+            for task in payload:
+                task_id = str(uuid.uuid4())
+                StubHandler.tasks[task_id] = (time.time() + self.task_delay, task.get("keywords", []))
+                with StubHandler._count_lock:
+                    StubHandler.request_count += 1
+                    StubHandler.keyword_count += len(task.get("keywords", []))
+                tasks.append({"id": task_id, "status_code": 20100, "status_message": "Task Created."})
+            self._send_json(200, {"status_code": 20000, "status_message": "Ok.", "tasks": tasks})
+        elif self.path == '/v3/keywords_data/google_ads/search_volume/live':
+            tasks = []
+            for task in payload:
+                keywords = task.get("keywords", [])
+                with StubHandler._count_lock:
+                    StubHandler.request_count += 1
+                    StubHandler.keyword_count += len(keywords)
+                tasks.append({
+                    "status_code": 20000,
+                    "status_message": "Ok.",
+                    "result": [fake_keyword_result(keyword) for keyword in keywords],
+                })
+            self._send_json(200, {"status_code": 20000, "status_message": "Ok.", "tasks": tasks})
+        else:
+            self._send_json(404, {"status_code": 40400, "status_message": "Not Found."})
+
+
+def start_stub_server(port=0, latency=0.0, failure_rate=0.0, task_delay=0.0):
+    """
+    Start the stub server in a background thread.
+
+    Parameters:
+        port: Port to listen on (0 picks a free port).
+        latency: Seconds to wait before answering each request.
+        failure_rate: Probability (0-1) of answering a request with HTTP 500.
+        task_delay: Seconds before a posted task shows up as ready.
+
+    Returns:
+        Tuple of (server, base_url)
+    """
+    StubHandler.latency = latency
+    StubHandler.failure_rate = failure_rate
+    StubHandler.task_delay = task_delay
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local DataForSEO stub server.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds of delay per request")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--task-delay', type=float, default=0.0, help="seconds before posted tasks are ready")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.failure_rate, args.task_delay)
+    print(f"DataForSEO stub listening on {url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import tempfile
+import google_ads_metrics
+from keyword_cache import normalize_keyword
+from paths import get_data_dir
+
+# Settings
+KEYWORDS_PER_TASK = 1000  # max keywords per search volume task
+TASKS_PER_POST = 100  # max tasks per task_post request
+POLL_INTERVAL = 60  # seconds between checks for finished tasks
+RECHECK_AFTER = 15 * 60  # seconds before a pending task missing from tasks_ready is fetched directly
+MAX_TASK_ATTEMPTS = 3  # submissions of the same keywords before a failing task is dropped
+MAX_WAIT = 3 * 60 * 60  # seconds run_task_backfill waits for pending tasks before giving up
+
+# task_get status codes of tasks that are still being processed (anything else but 20000 is an error)
+IN_PROGRESS_STATUSES = {40601, 40602}
+
+TASKS_ENDPOINT = "/v3/keywords_data/google_ads/search_volume"
+
+# Submitted but not yet collected tasks, persisted so a restart resumes instead of re-buying
+PENDING_TASKS_PATH = os.path.join(get_data_dir(), 'dataforseo_tasks.json')
+
+
+def load_pending_tasks():
+    """Load pending tasks as a dictionary of task id -> {"keywords", "posted_at"}."""
+    if not os.path.exists(PENDING_TASKS_PATH):
+        return {}
+    try:
+        with open(PENDING_TASKS_PATH, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Error reading {PENDING_TASKS_PATH}. Starting with no pending tasks.")
+        return {}
+
+
+def save_pending_tasks(pending_tasks):
+    """Write pending tasks atomically (temporary file + rename)."""
+    directory = os.path.dirname(PENDING_TASKS_PATH)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.dataforseo_tasks.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(pending_tasks, f)
+        os.replace(tmp_path, PENDING_TASKS_PATH)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def submit_keyword_tasks(keywords):
+    """
+    Submit search volume tasks for keywords that are neither cached nor already pending.
+
+    Parameters:
+        keywords: List of keyword strings (duplicates allowed).
+
+    Returns:
+        Number of tasks submitted
+    """
+    pending_tasks = load_pending_tasks()
+    already_pending = {keyword for task in pending_tasks.values() for keyword in task['keywords']}
+
+    unique_keywords = list(dict.fromkeys(normalize_keyword(keyword) for keyword in keywords if keyword))
+    cached = google_ads_metrics.keyword_cache.get_many(unique_keywords)
+    to_submit = [keyword for keyword in unique_keywords if keyword not in cached and keyword not in already_pending]
+
+    print(f"Task mode: {len(unique_keywords)} unique keywords, {len(cached)} cached, "
+          f"{len(already_pending)} already pending, {len(to_submit)} to submit")
+
+    chunks = [to_submit[i:i+KEYWORDS_PER_TASK] for i in range(0, len(to_submit), KEYWORDS_PER_TASK)]
+    return post_tasks(chunks, pending_tasks)
+
+
+def post_tasks(chunks, pending_tasks, attempts=1):
+    """
+    Post one search volume task per keyword chunk and record the accepted ones as pending.
+
+    Parameters:
+        chunks: List of keyword lists, at most KEYWORDS_PER_TASK keywords each.
+        pending_tasks: Pending tasks dictionary, updated and saved in place.
+        attempts: Submission count stored with the tasks (1 for a first submission).
+
+    Returns:
+        Number of tasks submitted
+    """
+    submitted = 0
+
+    for i in range(0, len(chunks), TASKS_PER_POST):
+        payload = [
+            {
+                "keywords": chunk,
+                "language_code": "en",
+                "location_code": 2840  # USA
+            }
+            for chunk in chunks[i:i+TASKS_PER_POST]
+        ]
+        data = google_ads_metrics.request_with_retries('POST', f"{TASKS_ENDPOINT}/task_post", payload)
+
+        for task, chunk in zip(data.get("tasks", []), chunks[i:i+TASKS_PER_POST]):
+            if task.get("status_code") == 20100 and task.get("id"):
+                pending_tasks[task["id"]] = {"keywords": chunk, "posted_at": time.time(), "attempts": attempts}
+                submitted += 1
+            else:
+                print(f"Task for {len(chunk)} keywords was rejected: {task.get('status_message')}")
+
+        # Persist after every request so a crash never loses paid task ids
+        save_pending_tasks(pending_tasks)
+
+    return submitted
+
+
+def collect_ready_tasks():
+    """
+    Download the results of every finished pending task into the keyword cache.
+
+    Tasks listed by tasks_ready are fetched right away. Pending tasks that have been
+    waiting longer than RECHECK_AFTER without showing up there (tasks_ready lists a task
+    only once, so e.g. one fetched just before a crash never reappears) are fetched
+    directly. Tasks that come back with an error status are resubmitted up to
+    MAX_TASK_ATTEMPTS times, then dropped.
+
+    Returns:
+        Number of pending tasks left
+    """
+    pending_tasks = load_pending_tasks()
+    if not pending_tasks:
+        return 0
+
+    data = google_ads_metrics.request_with_retries('GET', f"{TASKS_ENDPOINT}/tasks_ready")
+    ready_ids = [item.get("id") for task in data.get("tasks", []) for item in (task.get("result") or [])]
+    ready_ids = [task_id for task_id in ready_ids if task_id in pending_tasks]
+
+    now = time.time()
+    stale_ids = [
+        task_id for task_id, task in pending_tasks.items()
+        if task_id not in ready_ids and now - task.get('checked_at', task['posted_at']) > RECHECK_AFTER
+    ]
+    failed = []
+
+    for task_id in ready_ids + stale_ids:
+        try:
+            result = google_ads_metrics.request_with_retries('GET', f"{TASKS_ENDPOINT}/task_get/{task_id}")
+        except Exception as e:
+            print(f"Error collecting task {task_id}: {e}")
+            continue
+
+        tasks = result.get("tasks", [])
+        statuses = {task.get("status_code") for task in tasks}
+        if not tasks or statuses & IN_PROGRESS_STATUSES:
+            pending_tasks[task_id]['checked_at'] = now
+            save_pending_tasks(pending_tasks)
+            continue
+
+        metrics = google_ads_metrics.parse_search_volume_tasks(tasks)
+        completed = statuses == {20000}
+
+        if completed:
+            # Keywords a completed task has no row for have no data - cache that too
+            for keyword in pending_tasks[task_id]['keywords']:
+                metrics.setdefault(keyword, google_ads_metrics.NO_SEARCH_DATA)
+        else:
+            messages = ', '.join(str(task.get('status_message')) for task in tasks if task.get("status_code") != 20000)
+            print(f"Task {task_id} failed: {messages}")
+            failed.append(pending_tasks[task_id])
+        google_ads_metrics.keyword_cache.put_many(metrics)
+
+        del pending_tasks[task_id]
+        save_pending_tasks(pending_tasks)
+        if completed:
+            print(f"Collected task {task_id}: metrics for {len(metrics)} keywords")
+
+    for task in failed:
+        # Resubmit the keywords the failed task didn't return metrics for
+        cached = google_ads_metrics.keyword_cache.get_many(task['keywords'])
+        keywords = [keyword for keyword in task['keywords'] if keyword not in cached]
+        attempts = task.get('attempts', 1)
+        if not keywords:
+            continue
+        if attempts >= MAX_TASK_ATTEMPTS:
+            print(f"Dropping {len(keywords)} keywords after {attempts} failed tasks")
+            continue
+        post_tasks([keywords], pending_tasks, attempts + 1)
+
+    return len(pending_tasks)
+
+
+def run_task_backfill(keywords, wait=True, max_wait=MAX_WAIT):
+    """
+    Fetch metrics for keywords through the task_post/task_get workflow.
+
+    Parameters:
+        keywords: List of keyword strings.
+        wait: Poll until all pending tasks are collected. Otherwise submit, collect
+            whatever is ready and return - rerun later to pick up the rest.
+        max_wait: Seconds to keep polling before returning with tasks still pending.
+
+    Returns:
+        Number of pending tasks left
+    """
+    if not google_ads_metrics.DATAFORSEO_USERNAME or not google_ads_metrics.DATAFORSEO_PASSWORD:
+        print("DataForSEO credentials are not set - task mode is unavailable.")
+        return 0
+
+    submit_keyword_tasks(keywords)
+    remaining = collect_ready_tasks()
+
+    deadline = time.time() + max_wait
+
+    while wait and remaining:
+        if time.time() >= deadline:
+            print(f"Gave up waiting after {max_wait}s with {remaining} tasks pending.")
+            break
+        print(f"{remaining} tasks pending, checking again in {POLL_INTERVAL}s...")
+        time.sleep(POLL_INTERVAL)
+        remaining = collect_ready_tasks()
+
+    return remaining
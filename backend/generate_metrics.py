@@ -2,13 +2,42 @@
 """
 Script to generate missing metrics for SaaS ideas.
 This script calls the generate_missing_metrics function from reddit_pipeline.py.
+
+By default keywords are fetched from the live DataForSEO endpoint. With --tasks,
+keywords are submitted as DataForSEO tasks instead, which is cheaper for large
+backfills. Submitted task ids are saved, so a restarted run resumes collecting
+them instead of buying them again.
 """
 
 import sys
+import argparse
 from reddit_pipeline import generate_missing_metrics
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate missing metrics for SaaS ideas.")
+    parser.add_argument('--tasks', action='store_true',
+                        help="use the task_post/task_get workflow instead of the live endpoint")
+    parser.add_argument('--no-wait', action='store_true',
+                        help="with --tasks: submit and collect what is ready, then exit; rerun later for the rest")
+    args = parser.parse_args()
+    
     print("Starting metric generation for products with null attributes...")
+    
+    if args.tasks:
+        from reddit_pipeline import idea_store
+        from dataforseo_tasks import run_task_backfill
+        
+        print("This will use DataForSEO tasks to get metrics for keywords.")
+        keywords = [keyword for idea in idea_store.iter_ideas(missing_metrics_only=True) for keyword in idea['keywords']]
+        remaining = run_task_backfill(keywords, wait=not args.no_wait)
+        if remaining:
+            print(f"{remaining} tasks still pending. Run this command again to collect them.")
+        
+        # Apply everything that is now cached without spending API operations
+        generate_missing_metrics(cached_only=True)
+        print("Process completed.")
+        sys.exit(0)
+    
     print("This will use the Google Ads API to get metrics for keywords.")
     print("Batches will be limited to", end=" ")
     
@@ -22,4 +51,4 @@ if __name__ == "__main__":
     # Run the function to generate missing metrics
     generate_missing_metrics()
     
-    print("Process completed.")
\ No newline at end of file
+    print("Process completed.")
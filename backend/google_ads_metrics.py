@@ -2,7 +2,15 @@ import os
 from dotenv import load_dotenv
 import requests
 import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from math import floor
+import numpy as np
+import metrics
+from keyword_cache import KeywordCache, normalize_keyword
+from paths import get_data_dir
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,12 +18,48 @@ load_dotenv()
 # DataForSEO API credentials
 DATAFORSEO_USERNAME = os.getenv('DATAFORSEO_USERNAME')
 DATAFORSEO_PASSWORD = os.getenv('DATAFORSEO_PASSWORD')
+# Base URL of the API - point this at dataforseo_stub.py to run offline
+DATAFORSEO_API_URL = os.getenv('DATAFORSEO_API_URL', 'https://api.dataforseo.com').rstrip('/')
+
+# Client settings
+BATCH_SIZE = 1000  # max keywords per live request
+MAX_CONCURRENT_REQUESTS = max(1, int(os.getenv('DATAFORSEO_MAX_CONCURRENT_REQUESTS', 4)))
+REQUEST_TIMEOUT = 120  # seconds
+MAX_RETRIES = 3
+RETRY_BACKOFF_BASE = 2  # seconds, doubled after every retry
+DAILY_QUOTA = int(os.getenv('DATAFORSEO_DAILY_QUOTA', 0))  # tasks per UTC day the budget allows, 0 for no quota
+
 # Default values for when metrics can't be retrieved
 DUMMY_DATA = [0, "N/A", 0]
+# Raw metrics of a keyword the API has no data for
+NO_SEARCH_DATA = {"search_volume": 0, "competition_index": None, "monthly_searches": []}
+
+# Keyword metrics cache - repeated keywords cost no API operations until they expire
+KEYWORD_CACHE_TTL_DAYS = float(os.getenv('KEYWORD_CACHE_TTL_DAYS', 30))
+keyword_cache = KeywordCache(
+    os.path.join(get_data_dir(), 'keyword_cache.db'),
+    ttl_seconds=KEYWORD_CACHE_TTL_DAYS * 24 * 60 * 60
+)
+
+# Shared HTTP session, created on first use
+_session = None
+_session_lock = threading.Lock()
+
+# Metrics - every posted task is one billed DataForSEO operation
+request_latency = metrics.histogram('dataforseo_request_seconds', "Duration of DataForSEO requests", ['endpoint'])
+request_count = metrics.counter('dataforseo_requests_total', "DataForSEO requests by result", ['endpoint', 'status'])
+operations = metrics.counter('dataforseo_operations_total', "DataForSEO tasks posted")
+operations_today = metrics.gauge('dataforseo_operations_today', "DataForSEO tasks posted today (UTC) by all processes")
+metrics.gauge('dataforseo_daily_quota', "DataForSEO tasks per UTC day the budget allows (0: no quota)").set(DAILY_QUOTA)
+keyword_lookups = metrics.counter('keyword_cache_lookups_total', "Keyword metrics lookups by result", ['result'])
+
+class TransientAPIError(Exception):
+    """A DataForSEO failure that is worth retrying."""
 
 def approximate_revenue(average_searches, competition, CR=0.01, B=50, alpha=1.0, k=1000, beta=0.2):
     '''
     Calculate approximate monthly revenue based on search volume and competition.
+    Accepts scalars or NumPy arrays (missing values count as 0); arrays are computed elementwise.
     
     Parameters:
         average_searches: Average monthly keyword searches (S).
@@ -25,10 +69,13 @@ def approximate_revenue(average_searches, competition, CR=0.01, B=50, alpha=1.0,
         alpha: Demand sensitivity factor (default 1.0).
         k: Saturation constant for demand (default 1000).
         beta: Competition sensitivity factor (default 0.2).
+        
+    Returns:
+        Revenue as an int, or an int64 array for array input
     '''
     try:
-        average_searches = float(average_searches or 0)
-        competition = float(competition or 0)
+        average_searches = np.nan_to_num(np.asarray(average_searches, dtype=float))
+        competition = np.nan_to_num(np.asarray(competition, dtype=float))
         
         # Calculate the number of paying customers
         paying_customers = average_searches * CR
@@ -38,127 +85,284 @@ def approximate_revenue(average_searches, competition, CR=0.01, B=50, alpha=1.0,
         
         # Calculate the total estimated monthly revenue
         revenue = paying_customers * price
-        return int(revenue)
+        if np.ndim(revenue) == 0:
+            return int(revenue)
+        return revenue.astype(np.int64)
     except Exception as e:
         print(f"Revenue calculation error: {e}")
         return DUMMY_DATA[2]
 
 def get_google_metrics(keywords_list):
     """
-    Get Google Ads metrics for a list of keywords using DataForSEO API.
+    Get Google Ads metrics for a list of keywords, using the keyword cache first
+    and the DataForSEO API only for keywords that aren't cached.
     
     Parameters:
-        keywords_list: List of keyword strings to analyze.
+        keywords_list: List of keyword strings to analyze (duplicates allowed).
         
     Returns:
         Dictionary with keywords as keys and [avg_searches, competition_level, revenue] as values
     """
-    results = {}
-    
-    # Check if we have valid credentials and keywords
     if not keywords_list:
-        return results  # Return empty dict if no keywords
-        
-    if not DATAFORSEO_USERNAME or not DATAFORSEO_PASSWORD:
-        # Return dummy data for testing when credentials aren't available
-        return {keyword: DUMMY_DATA for keyword in keywords_list}
+        return {}  # Return empty dict if no keywords
     
-    # Prepare batches of keywords (max 1000 per request)
-    batch_size = 1000
-    for i in range(0, len(keywords_list), batch_size):
-        batch_keywords = keywords_list[i:i+batch_size]
-        
-        # DataForSEO endpoint for Google Ads search volume
-        endpoint_url = "https://api.dataforseo.com/v3/keywords_data/google_ads/search_volume/live"
-        
-        # Set up authentication
-        auth = requests.auth.HTTPBasicAuth(DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD)
-        
-        # Prepare payload
-        payload = [
-            {
-                "keywords": batch_keywords,
-                "language_code": "en",
-                "location_code": 2840  # USA
-            }
-        ]
+    # Normalize and deduplicate so each distinct keyword is looked up once
+    normalized = {keyword: normalize_keyword(keyword) for keyword in keywords_list}
+    unique_keywords = list(dict.fromkeys(keyword for keyword in normalized.values() if keyword))
+    
+    raw_metrics = keyword_cache.get_many(unique_keywords)
+    missing_keywords = [keyword for keyword in unique_keywords if keyword not in raw_metrics]
+    keyword_lookups.inc(len(unique_keywords) - len(missing_keywords), result='hit')
+    keyword_lookups.inc(len(missing_keywords), result='miss')
+    print(f"Keyword metrics: {len(keywords_list)} requested, {len(unique_keywords)} unique, "
+          f"{len(unique_keywords) - len(missing_keywords)} cached, {len(missing_keywords)} to fetch")
+    
+    if missing_keywords:
+        raw_metrics.update(fetch_google_metrics(missing_keywords))
+    
+    derived = {keyword: derive_metrics(raw) for keyword, raw in raw_metrics.items()}
+    return {keyword: derived.get(normalized[keyword], DUMMY_DATA) for keyword in keywords_list}
+
+def derive_metrics(raw, **model_params):
+    """
+    Derive [avg_searches, competition_level, revenue] from raw keyword metrics.
+    
+    Parameters:
+        raw: Raw metrics as stored in the keyword cache. Entries cached before raw
+            metrics were kept are already derived lists and are returned unchanged.
+        model_params: Optional approximate_revenue parameters (CR, B, alpha, k, beta).
         
-        headers = {
-            "Content-Type": "application/json"
-        }
+    Returns:
+        List of [avg_searches, competition_level, revenue]
+    """
+    if isinstance(raw, list):
+        return raw
+    
+    # Keywords with no search volume aren't useful - they get dummy values
+    search_volume = raw.get("search_volume")
+    if not search_volume:
+        return DUMMY_DATA
+    
+    competition_index = raw.get("competition_index")
+    return [
+        int(float(search_volume)),
+        map_competition(competition_index),
+        approximate_revenue(search_volume, competition_index, **model_params)
+    ]
+
+def get_session():
+    """Return the shared, connection-pooled HTTP session for DataForSEO."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=MAX_CONCURRENT_REQUESTS,
+                    pool_maxsize=MAX_CONCURRENT_REQUESTS
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.auth = requests.auth.HTTPBasicAuth(DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD)
+                session.headers.update({"Content-Type": "application/json"})
+                _session = session
+    return _session
+
+def utc_day():
+    return time.strftime('%Y-%m-%d', time.gmtime())
+
+def record_operations(count):
+    """
+    Count posted tasks against today's DataForSEO quota, warning when it is exceeded.
+    Daily totals are kept in the keyword cache database, so they survive restarts and
+    include tasks posted by generate_metrics.py and backfill runs.
+    """
+    operations.inc(count)
+    used = keyword_cache.add_operations(utc_day(), count)
+    operations_today.set(used)
+    if DAILY_QUOTA and used > DAILY_QUOTA and used - count <= DAILY_QUOTA:
+        print(f"DataForSEO daily quota of {DAILY_QUOTA} tasks exceeded ({used} tasks today)")
+
+def collect_operations_today():
+    """Set the operations gauge from the keyword cache database before metrics are rendered."""
+    operations_today.set(keyword_cache.operations_on(utc_day()))
+
+metrics.registry.add_collector(collect_operations_today)
+
+def endpoint_label(path):
+    """Metrics label of an endpoint path, without task ids."""
+    if '/task_get/' in path:
+        return path.rsplit('/', 1)[0]
+    return path
+
+def request_with_retries(method, path, payload=None):
+    """
+    Send a request to a DataForSEO endpoint, retrying transient failures
+    (connection errors, timeouts, HTTP 429/5xx and 5xxxx task errors) with exponential backoff.
+    
+    Parameters:
+        method: HTTP method, 'GET' or 'POST'.
+        path: Endpoint path relative to DATAFORSEO_API_URL.
+        payload: JSON-serializable request body for POST requests.
         
+    Returns:
+        Parsed JSON response
+    """
+    url = f"{DATAFORSEO_API_URL}{path}"
+    endpoint = endpoint_label(path)
+    
+    for attempt in range(MAX_RETRIES + 1):
         try:
-            # Make API request
-            response = requests.post(endpoint_url, auth=auth, headers=headers, json=payload)
+            try:
+                with request_latency.time(endpoint=endpoint):
+                    response = get_session().request(method, url, json=payload, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                request_count.inc(endpoint=endpoint, status=type(e).__name__)
+                raise
+            request_count.inc(endpoint=endpoint, status=response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise TransientAPIError(f"HTTP {response.status_code}")
             response.raise_for_status()
             data = response.json()
-            print(data)
             
-            # Process the results
-            if "tasks" in data:
-                for task in data["tasks"]:
-                    if "result" in task and isinstance(task["result"], list):
-                        for result_item in task["result"]:
-                            try:
-                                keyword = result_item.get("keyword", "")
-                                
-                                # Get search volume - directly from API if available
-                                search_volume = result_item.get("search_volume")
-                                
-                                # If no search volume, try to calculate from monthly data
-                                if search_volume is None and result_item.get("monthly_searches"):
-                                    try:
-                                        monthly_data = result_item["monthly_searches"]
-                                        valid_volumes = [m.get("search_volume") for m in monthly_data if m.get("search_volume") is not None]
-                                        if valid_volumes:
-                                            search_volume = sum(valid_volumes) / len(valid_volumes)
-                                    except Exception as e:
-                                        print(f"Error processing monthly volumes: {e}")
-                                
-                                # Skip keywords with no search volume - they're not useful
-                                if search_volume is None or search_volume == 0:
-                                    print(f"Skipping keyword '{keyword}' due to zero/null search volume")
-                                    continue
-                                    
-                                # Get competition index
-                                competition_index = result_item.get("competition_index")
-                                if competition_index is None:
-                                    # Try to map from competition string if available
-                                    competition_str = result_item.get("competition", "").upper()
-                                    if competition_str == "HIGH":
-                                        competition_index = 80
-                                    elif competition_str == "MEDIUM":
-                                        competition_index = 50
-                                    else:  # "LOW" or empty
-                                        competition_index = 20
-                                
-                                # Map competition to human-readable format
-                                competition_level = map_competition(competition_index)
-                                
-                                # Calculate estimated revenue
-                                revenue = approximate_revenue(search_volume, competition_index)
-                                
-                                # Store results with proper types
-                                results[keyword] = [
-                                    int(float(search_volume)), 
-                                    competition_level, 
-                                    revenue
-                                ]
-                            except Exception as e:
-                                print(f"Error processing result for keyword '{keyword}': {e}")
-                                results[keyword] = DUMMY_DATA
+            # DataForSEO reports server-side problems as 5xxxx status codes in the body
+            status_code = data.get("status_code", 20000)
+            if status_code >= 50000:
+                raise TransientAPIError(f"DataForSEO status {status_code}: {data.get('status_message')}")
+            if method == 'POST' and isinstance(payload, list):
+                record_operations(len(payload))
+            return data
+        except (requests.ConnectionError, requests.Timeout, TransientAPIError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, RETRY_BACKOFF_BASE)
+            print(f"DataForSEO request failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def fetch_keyword_batch(batch_keywords):
+    """
+    Fetch metrics for one batch of at most BATCH_SIZE keywords from the live endpoint.
+    
+    Returns:
+        Dictionary of metrics for every keyword the API answered for. If every task
+        succeeded, keywords without a result row get NO_SEARCH_DATA.
+    """
+    payload = [
+        {
+            "keywords": batch_keywords,
+            "language_code": "en",
+            "location_code": 2840  # USA
+        }
+    ]
+    data = request_with_retries('POST', "/v3/keywords_data/google_ads/search_volume/live", payload)
+    tasks = data.get("tasks", [])
+    results = parse_search_volume_tasks(tasks)
+    
+    if tasks and all(task.get("status_code") == 20000 for task in tasks):
+        # Keywords a successful response has no row for have no data - cache that too
+        for keyword in batch_keywords:
+            results.setdefault(keyword, NO_SEARCH_DATA)
+    return results
+
+def parse_search_volume_tasks(tasks):
+    """
+    Extract raw keyword metrics from DataForSEO search volume tasks.
+    
+    Parameters:
+        tasks: The "tasks" list of a DataForSEO response.
         
-        except Exception as e:
-            print(f"Error with DataForSEO API: {e}")
-            # Add dummy data for keywords in this batch
-            for keyword in batch_keywords:
-                if keyword not in results:
-                    results[keyword] = DUMMY_DATA
-    
-    # Ensure all requested keywords have results
-    for keyword in keywords_list:
-        if keyword not in results:
-            results[keyword] = DUMMY_DATA
+    Returns:
+        Dictionary with normalized keywords as keys and raw metrics
+        ({"search_volume", "competition_index", "monthly_searches"}) as values
+    """
+    results = {}
+    
+    for task in tasks:
+        if "result" in task and isinstance(task["result"], list):
+            for result_item in task["result"]:
+                keyword = normalize_keyword(result_item.get("keyword", ""))
+                try:
+                    # Get search volume - directly from API if available
+                    search_volume = result_item.get("search_volume")
+                    
+                    # If no search volume, try to calculate from monthly data
+                    if search_volume is None and result_item.get("monthly_searches"):
+                        try:
+                            monthly_data = result_item["monthly_searches"]
+                            valid_volumes = [m.get("search_volume") for m in monthly_data if m.get("search_volume") is not None]
+                            if valid_volumes:
+                                search_volume = sum(valid_volumes) / len(valid_volumes)
+                        except Exception as e:
+                            print(f"Error processing monthly volumes: {e}")
+                    
+                    # Get competition index
+                    competition_index = result_item.get("competition_index")
+                    if competition_index is None:
+                        # Try to map from competition string if available
+                        competition_str = (result_item.get("competition") or "").upper()
+                        if competition_str == "HIGH":
+                            competition_index = 80
+                        elif competition_str == "MEDIUM":
+                            competition_index = 50
+                        else:  # "LOW" or empty
+                            competition_index = 20
+                    
+                    # Store raw values so revenue can be recomputed later without the API
+                    results[keyword] = {
+                        "search_volume": int(float(search_volume or 0)),
+                        "competition_index": float(competition_index),
+                        "monthly_searches": [
+                            {"year": m.get("year"), "month": m.get("month"), "search_volume": m.get("search_volume")}
+                            for m in result_item.get("monthly_searches") or []
+                        ]
+                    }
+                except Exception as e:
+                    print(f"Error processing result for keyword '{keyword}': {e}")
+    
+    return results
+
+def fetch_google_metrics(keywords_list):
+    """
+    Fetch raw Google Ads metrics for a list of normalized keywords from the DataForSEO API
+    and store every keyword of a successful batch in the keyword cache, including
+    keywords the API has no data for.
+    
+    Batches are sent concurrently (up to MAX_CONCURRENT_REQUESTS) over a pooled session.
+    Keywords whose batch failed after all retries are left out, so callers give
+    them dummy values and they are fetched again next time.
+    
+    Parameters:
+        keywords_list: List of unique, normalized keyword strings.
+        
+    Returns:
+        Dictionary with keywords as keys and raw metrics as values
+    """
+    results = {}
+        
+    if not DATAFORSEO_USERNAME or not DATAFORSEO_PASSWORD:
+        # No results without credentials - callers fall back to dummy data
+        return results
+    
+    # Prepare batches of keywords (max 1000 per request)
+    batches = [keywords_list[i:i+BATCH_SIZE] for i in range(0, len(keywords_list), BATCH_SIZE)]
+    failed_keywords = 0
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(batches))) as executor:
+        futures = {executor.submit(fetch_keyword_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch_keywords = futures[future]
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                print(f"Error with DataForSEO API for a batch of {len(batch_keywords)} keywords: {e}")
+                failed_keywords += len(batch_keywords)
+                continue
+            
+            keyword_cache.put_many(batch_results)
+            results.update(batch_results)
+    
+    if failed_keywords:
+        print(f"{failed_keywords} of {len(keywords_list)} keywords failed and got dummy values.")
     
     return results
 
@@ -187,5 +391,5 @@ if __name__ == "__main__":
     test_keywords = [
       "karma growth"
     ]
-    metrics = get_google_metrics(test_keywords)
-    print(f"Metrics for test keywords: {metrics}")
+    keyword_metrics = get_google_metrics(test_keywords)
+    print(f"Metrics for test keywords: {keyword_metrics}")
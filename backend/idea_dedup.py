@@ -0,0 +1,173 @@
+import re
+import math
+import zlib
+import threading
+from collections import Counter
+
+# Settings
+DEFAULT_THRESHOLD = 0.5  # TF-IDF cosine similarity above which an idea is a duplicate
+TITLE_WEIGHT = 3  # Title words count this many times more than description words
+FEATURE_BUCKETS = 2**20  # Words are hashed into this many features, so memory stays bounded
+MAX_POSTING_FRACTION = 0.05  # Features found in more than this share of ideas are skipped on lookup
+MIN_POSTING_LIMIT = 50  # ...but small indexes always look at every feature
+
+# Common words that say nothing about what an idea is about
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'for', 'from', 'help', 'helps', 'in',
+    'into', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their', 'them', 'this', 'to',
+    'tool', 'platform', 'app', 'users', 'user', 'with', 'while', 'who', 'which', 'based', 'your',
+    'you', 'allows', 'provides', 'offers', 'through', 'using', 'like', 'more', 'all', 'they',
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ('ing', 'ers', 'er', 'es', 's', 'ed')
+
+
+def stem(word):
+    """Strip a common English suffix so 'tracker', 'tracking' and 'tracks' match."""
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Lowercased, stemmed words without stopwords."""
+    return [stem(word) for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def idea_features(idea):
+    """
+    Hashed term counts of an idea's title and description.
+
+    Returns:
+        Counter of feature id -> term count
+    """
+    counts = Counter()
+    for word in tokenize(idea.get('product_title') or ''):
+        counts[zlib.crc32(word.encode('utf-8')) % FEATURE_BUCKETS] += TITLE_WEIGHT
+    for word in tokenize(idea.get('description') or ''):
+        counts[zlib.crc32(word.encode('utf-8')) % FEATURE_BUCKETS] += 1
+    return counts
+
+
+class IdeaDeduplicator:
+    """
+    Incremental TF-IDF index over idea titles and descriptions.
+
+    Ideas are stored in an inverted index (feature -> ideas containing it). A lookup only
+    scores ideas that share a feature with the new idea, and skips features so common that
+    they carry almost no weight, so it doesn't scan every stored idea.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.doc_freq = Counter()
+        self.postings = {}  # feature -> list of (position, normalized weight)
+        self.titles = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _idf(self, feature):
+        return math.log((len(self.titles) + 1) / (self.doc_freq[feature] + 1)) + 1
+
+    def _weights(self, counts):
+        """L2-normalized TF-IDF weights with the current document frequencies."""
+        weights = {feature: (1 + math.log(count)) * self._idf(feature) for feature, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {feature: weight / norm for feature, weight in weights.items()}
+
+    def _find(self, counts):
+        posting_limit = max(MIN_POSTING_LIMIT, MAX_POSTING_FRACTION * len(self.titles))
+        scores = Counter()
+        for feature, weight in self._weights(counts).items():
+            postings = self.postings.get(feature)
+            if not postings or len(postings) > posting_limit:
+                continue
+            for position, stored_weight in postings:
+                scores[position] += weight * stored_weight
+
+        if scores:
+            position, similarity = scores.most_common(1)[0]
+            if similarity >= self.threshold:
+                return position, similarity
+        return None
+
+    def _add(self, counts, title):
+        position = len(self.titles)
+        self.titles.append(title)
+        self.doc_freq.update(counts.keys())
+        # Stored weights use the document frequencies at insert time
+        for feature, weight in self._weights(counts).items():
+            self.postings.setdefault(feature, []).append((position, weight))
+
+    def build(self, ideas):
+        """
+        Index existing ideas without checking them for duplicates. Document frequencies
+        are counted over all of them first, so every stored weight uses the full corpus.
+        """
+        features = [(idea_features(idea), idea.get('product_title', '')) for idea in ideas]
+        with self._lock:
+            self.doc_freq.update(feature for counts, _ in features for feature in counts)
+            offset = len(self.titles)
+            self.titles.extend(title for _, title in features)
+            for i, (counts, _) in enumerate(features):
+                for feature, weight in self._weights(counts).items():
+                    self.postings.setdefault(feature, []).append((offset + i, weight))
+        return self
+
+    def add(self, idea):
+        """Add an idea to the index without checking for duplicates."""
+        counts = idea_features(idea)
+        with self._lock:
+            self._add(counts, idea.get('product_title', ''))
+
+    def check(self, idea):
+        """
+        Check an idea against the index without adding it.
+
+        Returns:
+            None if the idea is new, otherwise (title of the existing idea, cosine similarity)
+        """
+        counts = idea_features(idea)
+        with self._lock:
+            match = self._find(counts)
+            if match:
+                return self.titles[match[0]], match[1]
+            return None
+
+    def check_and_add(self, idea):
+        """
+        Check an idea against the index and add it if it is new.
+
+        Returns:
+            None if the idea is new, otherwise (title of the existing idea, cosine similarity)
+        """
+        counts = idea_features(idea)
+        with self._lock:
+            match = self._find(counts)
+            if match:
+                return self.titles[match[0]], match[1]
+            self._add(counts, idea.get('product_title', ''))
+            return None
+
+    def filter_new(self, ideas):
+        """
+        Drop ideas that duplicate an indexed idea or an earlier idea in the same list.
+        New ideas are not added to this index; add() them once they are stored.
+
+        Returns:
+            Tuple of (new ideas, list of (dropped idea, existing title, similarity))
+        """
+        new_ideas, duplicates = [], []
+        # Accepted ideas of this list are only indexed here, to catch duplicates among them
+        accepted = IdeaDeduplicator(self.threshold)
+        for idea in ideas:
+            match = self.check(idea) or accepted.check_and_add(idea)
+            if match:
+                duplicates.append((idea, match[0], match[1]))
+            else:
+                new_ideas.append(idea)
+        return new_ideas, duplicates
@@ -0,0 +1,155 @@
+import re
+import sqlite3
+import threading
+from idea_table import IdeaTable
+
+# Columns of the full-text index and their bm25 weights (a title match outranks a keyword
+# match, which outranks a description match)
+SEARCH_COLUMNS = ['product_title', 'description', 'keywords']
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_TERMS = 10
+MAX_SEARCH_PAGE = 100000  # larger pages are rejected, since (page - 1) * limit must fit an SQLite integer
+
+# unicode61 without stemming, because FTS5 doesn't stem prefix queries; the prefix
+# option keeps short prefix lookups from scanning the whole term list
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(q):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match as a prefix,
+    so "email sec" finds "Email Security Monitor". Single characters only match whole
+    words, since as a prefix they would match (and rank) most of the dataset.
+
+    Raises:
+        ValueError: If the text has no searchable words
+    """
+    terms = _TERM_RE.findall(q.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise ValueError("q must contain at least one word")
+    # Quoting keeps words like "and"/"or"/"near" from being read as operators
+    return ' '.join(f'"{term}"*' if len(term) > 1 else f'"{term}"' for term in terms)
+
+
+def bm25_expression(table):
+    return f"bm25({table}, {', '.join(str(weight) for weight in BM25_WEIGHTS)})"
+
+
+def keywords_text(keywords):
+    if isinstance(keywords, str):
+        return keywords
+    return ' '.join(str(keyword) for keyword in keywords or [])
+
+
+def page_result(ideas, total, page, limit):
+    """Pagination envelope shared with ideas_query.IdeaIndex.query."""
+    pages = (total + limit - 1) // limit
+    return {
+        "ideas": ideas,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "pages": pages,
+        "next_page": page + 1 if page < pages else None,
+    }
+
+
+class IdeaSearchIndex:
+    """
+    In-memory SQLite FTS5 index over a list of SaaS ideas, ranked with bm25.
+
+    Row ids are positions in the idea list, so results map straight back to the
+    dictionaries that were indexed.
+    """
+
+    def __init__(self, ideas=()):
+        """
+        Parameters:
+            ideas: List of idea dictionaries, or an IdeaTable. A table is indexed in place
+                and rows are only materialized for the results, but can't be added to.
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._conn.execute(f"CREATE VIRTUAL TABLE ideas_fts USING fts5({', '.join(SEARCH_COLUMNS)}, {FTS_OPTIONS})")
+        if isinstance(ideas, IdeaTable):
+            self.ideas = ideas
+            self._index(ideas, 0)
+        else:
+            self.ideas = []
+            self.add(ideas)
+
+    def _index(self, ideas, start):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO ideas_fts (rowid, product_title, description, keywords) VALUES (?, ?, ?, ?)",
+                (
+                    (position, str(idea.get('product_title') or ''), str(idea.get('description') or ''),
+                     keywords_text(idea.get('keywords')))
+                    for position, idea in enumerate(ideas, start)
+                )
+            )
+
+    def add(self, ideas):
+        """Index more ideas."""
+        ideas = list(ideas)
+        with self._lock:
+            if isinstance(self.ideas, IdeaTable):
+                raise TypeError("Can't add ideas to a search index over an IdeaTable")
+            start = len(self.ideas)
+            self.ideas.extend(ideas)
+            self._index(ideas, start)
+
+    def search(self, q, page=1, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Return one page of ideas matching q, best match first.
+
+        Parameters:
+            q: Free text; every word of two or more characters is matched as a prefix.
+            page: 1-based page number.
+            limit: Number of ideas per page.
+        """
+        match = build_match_query(q)
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM ideas_fts WHERE ideas_fts MATCH ?", (match,)).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT rowid FROM ideas_fts WHERE ideas_fts MATCH ? ORDER BY {bm25_expression('ideas_fts')} LIMIT ? OFFSET ?",
+                (match, limit, (page - 1) * limit)
+            ).fetchall()
+        return page_result([self.ideas[rowid] for rowid, in rows], total, page, limit)
+
+
+def parse_search_args(args):
+    """
+    Parse and validate request query arguments for IdeaSearchIndex.search.
+
+    Raises:
+        ValueError: If an argument has an invalid value
+    """
+    q = (args.get('q') or '').strip()
+    if not q:
+        raise ValueError("q is required")
+
+    def int_arg(name, default, maximum=None):
+        raw = args.get(name)
+        if raw is None or raw == '':
+            return default
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer")
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1")
+        if maximum is not None and value > maximum:
+            raise ValueError(f"{name} must be at most {maximum}")
+        return value
+
+    return {
+        "q": q,
+        "page": int_arg('page', 1, MAX_SEARCH_PAGE),
+        "limit": min(int_arg('limit', DEFAULT_SEARCH_LIMIT), MAX_SEARCH_LIMIT),
+    }
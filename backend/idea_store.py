@@ -0,0 +1,262 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import urllib.request
+import idea_search
+
+# Columns that make up an exported idea, in the order they appear in SaaS_ideas.json
+IDEA_FIELDS = ['product_title', 'description', 'keywords', 'avg_monthly_searches', 'competition_level', 'revenue']
+METRIC_FIELDS = ['avg_monthly_searches', 'competition_level', 'revenue']
+
+
+class IdeaStore:
+    """
+    Append-only SQLite table of generated SaaS ideas.
+
+    New ideas are inserted as rows and metric updates touch only the affected rows,
+    so the cost of a pipeline batch no longer depends on the size of the dataset.
+    SaaS_ideas.json is produced from the table by export_json().
+    """
+
+    def __init__(self, db_path, legacy_json_path=None, read_only=False):
+        """
+        Parameters:
+            db_path: Path of the SQLite database file.
+            legacy_json_path: Optional SaaS_ideas.json to import when the table is first created.
+            read_only: Open an existing database without creating or migrating anything,
+                for readers such as the web app.
+        """
+        self.db_path = db_path
+        self.read_only = read_only
+        self._local = threading.local()
+        if read_only:
+            return
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ideas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_title TEXT NOT NULL,
+                    description TEXT,
+                    keywords TEXT NOT NULL DEFAULT '[]',
+                    avg_monthly_searches INTEGER,
+                    competition_level TEXT,
+                    revenue INTEGER,
+                    extra TEXT,
+                    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ideas_title ON ideas (product_title)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._create_search_index(conn)
+
+        if legacy_json_path:
+            self.import_json(legacy_json_path)
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.read_only:
+                uri = 'file:' + urllib.request.pathname2url(os.path.abspath(self.db_path)) + '?mode=ro'
+                conn = sqlite3.connect(uri, uri=True, timeout=30)
+            else:
+                conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _create_search_index(self, conn):
+        """
+        Create the FTS5 index over titles, descriptions and keywords. Triggers keep it in
+        sync with the ideas table, so appends are indexed in the same transaction.
+        """
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS ideas_fts USING fts5(
+                {', '.join(idea_search.SEARCH_COLUMNS)}, content = 'ideas', content_rowid = 'id',
+                {idea_search.FTS_OPTIONS}
+            )
+        """)
+        conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS ideas_fts_insert AFTER INSERT ON ideas BEGIN
+                INSERT INTO ideas_fts (rowid, product_title, description, keywords)
+                VALUES (new.id, new.product_title, new.description, new.keywords);
+            END;
+            CREATE TRIGGER IF NOT EXISTS ideas_fts_delete AFTER DELETE ON ideas BEGIN
+                INSERT INTO ideas_fts (ideas_fts, rowid, product_title, description, keywords)
+                VALUES ('delete', old.id, old.product_title, old.description, old.keywords);
+            END;
+            CREATE TRIGGER IF NOT EXISTS ideas_fts_update AFTER UPDATE OF product_title, description, keywords ON ideas BEGIN
+                INSERT INTO ideas_fts (ideas_fts, rowid, product_title, description, keywords)
+                VALUES ('delete', old.id, old.product_title, old.description, old.keywords);
+                INSERT INTO ideas_fts (rowid, product_title, description, keywords)
+                VALUES (new.id, new.product_title, new.description, new.keywords);
+            END;
+        """)
+        # Databases created before the index existed are indexed once
+        if not conn.execute("SELECT 1 FROM meta WHERE key = 'ideas_fts_built'").fetchone():
+            conn.execute("INSERT INTO ideas_fts (ideas_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO meta (key, value) VALUES ('ideas_fts_built', CURRENT_TIMESTAMP)")
+
+    def import_json(self, json_path):
+        """Import an existing SaaS_ideas.json once. Later calls are no-ops."""
+        if not os.path.exists(json_path):
+            return
+
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'ideas_json_imported'").fetchone():
+                return
+
+            try:
+                with open(json_path, 'r') as f:
+                    content = f.read().strip()
+                    ideas = json.loads(content) if content else []
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Error reading {json_path} for import: {e}")
+                return
+
+            conn.executemany(_INSERT_SQL, [_to_row(idea) for idea in ideas])
+            conn.execute("INSERT INTO meta (key, value) VALUES ('ideas_json_imported', ?)", (json_path,))
+            print(f"Imported {len(ideas)} ideas from {json_path}")
+
+    def append_ideas(self, ideas):
+        """
+        Insert new ideas. Each idea dictionary gets its row id stored under 'id'
+        so later metric updates can address it directly.
+        """
+        conn = self._connection()
+        with conn:
+            for idea in ideas:
+                cursor = conn.execute(_INSERT_SQL, _to_row(idea))
+                idea['id'] = cursor.lastrowid
+
+    def update_metrics(self, ideas):
+        """
+        Update metrics of stored ideas in place.
+        Ideas without an 'id' have not been appended yet and are skipped.
+
+        Returns:
+            Number of rows updated
+        """
+        rows = [(idea.get('avg_monthly_searches'), idea.get('competition_level'), idea.get('revenue'), idea['id'])
+                for idea in ideas if idea.get('id') is not None]
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "UPDATE ideas SET avg_monthly_searches = ?, competition_level = ?, revenue = ? WHERE id = ?",
+                rows
+            )
+        return len(rows)
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM ideas").fetchone()[0]
+
+    def iter_ideas(self, missing_metrics_only=False, include_id=False):
+        """
+        Yield stored ideas in insertion order without loading the whole table.
+
+        Parameters:
+            missing_metrics_only: Only yield ideas where any metric is null.
+            include_id: Include the row id under 'id'.
+        """
+        sql = "SELECT * FROM ideas"
+        if missing_metrics_only:
+            sql += " WHERE " + " OR ".join(f"{field} IS NULL" for field in METRIC_FIELDS)
+        sql += " ORDER BY id"
+
+        for row in self._connection().execute(sql):
+            yield _from_row(row, include_id)
+
+    def search(self, q, page=1, limit=idea_search.DEFAULT_SEARCH_LIMIT):
+        """
+        Full-text search over stored ideas, best bm25 match first.
+
+        Parameters:
+            q: Free text; every word of two or more characters is matched as a prefix.
+            page: 1-based page number.
+            limit: Number of ideas per page.
+
+        Returns:
+            Dictionary with the page of ideas and pagination metadata, shaped like IdeaSearchIndex.search()
+        """
+        match = idea_search.build_match_query(q)
+        conn = self._connection()
+        total = conn.execute("SELECT COUNT(*) FROM ideas_fts WHERE ideas_fts MATCH ?", (match,)).fetchone()[0]
+        rows = conn.execute(f"""
+            SELECT ideas.* FROM ideas_fts JOIN ideas ON ideas.id = ideas_fts.rowid
+            WHERE ideas_fts MATCH ? ORDER BY {idea_search.bm25_expression('ideas_fts')} LIMIT ? OFFSET ?
+        """, (match, limit, (page - 1) * limit))
+        return idea_search.page_result([_from_row(row) for row in rows], total, page, limit)
+
+    def export_json(self, json_path):
+        """
+        Write all ideas to json_path atomically (temporary file + rename), so readers
+        never see a partially written dataset.
+        """
+        directory = os.path.dirname(json_path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.SaaS_ideas.', suffix='.tmp')
+        count = 0
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write('[')
+                for idea in self.iter_ideas():
+                    f.write(',\n  ' if count else '\n  ')
+                    # Match the json.dump(..., indent=2) layout used historically
+                    f.write(json.dumps(idea, indent=2).replace('\n', '\n  '))
+                    count += 1
+                f.write('\n]' if count else ']')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, json_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return count
+
+
+_INSERT_SQL = """
+    INSERT INTO ideas (product_title, description, keywords, avg_monthly_searches, competition_level, revenue, extra)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _to_row(idea):
+    """Convert an idea dictionary into values for _INSERT_SQL."""
+    extra = {key: value for key, value in idea.items() if key not in IDEA_FIELDS and key != 'id'}
+    return (
+        idea.get('product_title', ''),
+        idea.get('description'),
+        json.dumps(idea.get('keywords') or []),
+        idea.get('avg_monthly_searches'),
+        idea.get('competition_level'),
+        idea.get('revenue'),
+        json.dumps(extra) if extra else None,
+    )
+
+
+def _from_row(row, include_id=False):
+    """Convert a database row back into the idea dictionary shape used in SaaS_ideas.json."""
+    idea = {'id': row['id']} if include_id else {}
+    idea.update({
+        'product_title': row['product_title'],
+        'description': row['description'],
+        'keywords': json.loads(row['keywords']),
+        'avg_monthly_searches': row['avg_monthly_searches'],
+        'competition_level': row['competition_level'],
+        'revenue': row['revenue'],
+    })
+    if row['extra']:
+        idea.update(json.loads(row['extra']))
+    return idea
@@ -0,0 +1,391 @@
+import json
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+import numpy as np
+import json_to_csv
+
+# Numeric value of a missing metric - sorts below every real value, as in ideas_query
+MISSING = -1
+
+# Competition levels ordered from least to most competitive; their codes are 1..5 and 0 is missing
+COMPETITION_LEVELS = ["Very Low", "Low", "Moderate", "High", "Very High"]
+
+# Idea keys stored in columns; any other key is kept in the sparse extras of its row
+COLUMN_FIELDS = ['product_title', 'description', 'keywords', 'avg_monthly_searches', 'competition_level', 'revenue']
+
+# Marks a column field the original idea didn't have, so rows() leaves it out
+_ABSENT = object()
+
+# Separates rows in the lowercased search buffer, so a match can't span two ideas
+_ROW_SEPARATOR = '\x00'
+
+ITER_CHUNK_SIZE = 10000  # rows materialized at a time when iterating over a whole table
+WITHIN_SCAN_RATIO = 4  # substring search checks pre-filtered rows one by one below 1/4 of the table
+
+
+def _numeric(value):
+    """Return value as an int, or MISSING if it isn't a usable number."""
+    if value is None or isinstance(value, bool):
+        return MISSING
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return MISSING
+
+
+def _keyword_list(keywords):
+    if not keywords:
+        return []
+    if isinstance(keywords, str):
+        return [keywords]
+    return [str(keyword) for keyword in keywords]
+
+
+def _reproduced(field, value):
+    """Whether the columns give back value for field unchanged (otherwise it's kept in extras)."""
+    if field in ('product_title', 'description'):
+        return type(value) is str
+    if field == 'keywords':
+        return type(value) is list and all(type(keyword) is str for keyword in value)
+    if field == 'competition_level':
+        return value is None or type(value) is str
+    # Numeric metrics: MISSING itself would come back as None
+    return value is None or (type(value) is int and value != MISSING)
+
+
+def _row_extras(idea):
+    """Keys and values of an idea the columns can't reproduce, or None if there are none."""
+    extra = {key: value for key, value in idea.items() if key not in COLUMN_FIELDS}
+    for field in COLUMN_FIELDS:
+        value = idea.get(field, _ABSENT)
+        if value is _ABSENT or not _reproduced(field, value):
+            extra[field] = value
+    return extra or None
+
+
+class StringColumn:
+    """
+    Strings stored back to back in one UTF-8 buffer, with offsets[i]:offsets[i+1]
+    delimiting string i - one bytes object instead of one Python object per row.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [(string or '').encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        return cls(b''.join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return self.data[self.offsets[position]:self.offsets[position + 1]].decode('utf-8')
+
+    def take(self, positions):
+        """Column of the strings at positions, in that order."""
+        starts = self.offsets[positions]
+        ends = self.offsets[np.asarray(positions) + 1]
+        offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        return StringColumn(b''.join(self.data[start:end] for start, end in zip(starts.tolist(), ends.tolist())), offsets)
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.offsets.nbytes
+
+
+class IdeaTable:
+    """
+    Columnar, read-only representation of a list of SaaS ideas.
+
+    Numeric metrics are int64 arrays (MISSING for ideas without metrics), competition is a
+    uint8 code into a small list of categories, titles and descriptions live in StringColumns
+    and keywords are interned: each row holds a range of codes into a shared vocabulary.
+    Rows are turned back into the usual idea dictionaries only when they are returned,
+    e.g. for one page of a query.
+
+    Whatever the columns can't represent - keys other than COLUMN_FIELDS, absent fields and
+    original values such as "N/A" metrics - is kept per row in the sparse extras dictionary
+    and merged back into the row, so ideas round-trip unchanged.
+    """
+
+    def __init__(self, titles, descriptions, keyword_vocabulary, keyword_codes, keyword_offsets,
+                 searches, revenue, competition_categories, competition_codes, extras=None):
+        self.titles = titles
+        self.descriptions = descriptions
+        self.keyword_vocabulary = keyword_vocabulary
+        self.keyword_codes = keyword_codes
+        self.keyword_offsets = keyword_offsets
+        self.searches = searches
+        self.revenue = revenue
+        self.competition_categories = competition_categories
+        self.competition_codes = competition_codes
+        self.extras = extras or {}  # position -> dictionary of keys the columns don't reproduce
+        # Sort rank of every competition code (unknown levels rank like missing ones)
+        self.competition_ranks = np.array(
+            [COMPETITION_LEVELS.index(category) + 1 if category in COMPETITION_LEVELS else 0
+             for category in competition_categories],
+            dtype=np.int8
+        )[competition_codes]
+        self._search_buffer = None
+        self._search_starts = None
+
+    @classmethod
+    def from_ideas(cls, ideas):
+        """Build a table from an iterable of idea dictionaries."""
+        titles, descriptions, searches, revenue, competition_codes = [], [], [], [], []
+        keyword_codes, keyword_counts = [], []
+        keyword_index = {}
+        competition_categories = [None] + COMPETITION_LEVELS
+        competition_index = {category: code for code, category in enumerate(competition_categories)}
+        extras = {}
+
+        for position, idea in enumerate(ideas):
+            title, description = idea.get('product_title'), idea.get('description')
+            keywords = idea.get('keywords')
+            searches_value, revenue_value = idea.get('avg_monthly_searches'), idea.get('revenue')
+            competition = idea.get('competition_level')
+
+            # Cheap checks first; only unusual rows go through _row_extras
+            if (len(idea) != len(COLUMN_FIELDS) or type(title) is not str or type(description) is not str
+                    or type(keywords) is not list or type(competition) not in (str, type(None))
+                    or type(searches_value) not in (int, type(None)) or type(revenue_value) not in (int, type(None))
+                    or searches_value == MISSING or revenue_value == MISSING
+                    or not all(type(keyword) is str for keyword in keywords)):
+                extra = _row_extras(idea)
+                if extra:
+                    extras[position] = extra
+
+            titles.append(str(title or ''))
+            descriptions.append(str(description or ''))
+            keywords = _keyword_list(keywords)
+            keyword_counts.append(len(keywords))
+            for keyword in keywords:
+                code = keyword_index.get(keyword)
+                if code is None:
+                    code = keyword_index[keyword] = len(keyword_index)
+                keyword_codes.append(code)
+            searches.append(_numeric(searches_value))
+            revenue.append(_numeric(revenue_value))
+
+            if type(competition) not in (str, type(None)):
+                # Kept in extras; sorts and filters like a missing level
+                competition = None
+            code = competition_index.get(competition)
+            if code is None:
+                code = competition_index[competition] = len(competition_categories)
+                competition_categories.append(competition)
+            competition_codes.append(code)
+
+        if len(competition_categories) > 256:
+            raise ValueError("Too many distinct competition levels for a uint8 code")
+
+        keyword_offsets = np.zeros(len(keyword_counts) + 1, dtype=np.int64)
+        np.cumsum(keyword_counts, out=keyword_offsets[1:])
+        return cls(
+            StringColumn.from_strings(titles),
+            StringColumn.from_strings(descriptions),
+            list(keyword_index),
+            np.array(keyword_codes, dtype=np.int32),
+            keyword_offsets,
+            np.array(searches, dtype=np.int64),
+            np.array(revenue, dtype=np.int64),
+            competition_categories,
+            np.array(competition_codes, dtype=np.uint8),
+            extras,
+        )
+
+    def __len__(self):
+        return len(self.searches)
+
+    def __getitem__(self, key):
+        """An idea dictionary for an int, a new table for a slice."""
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        return self.row(key)
+
+    def __iter__(self):
+        for start in range(0, len(self), ITER_CHUNK_SIZE):
+            yield from self.rows(np.arange(start, min(start + ITER_CHUNK_SIZE, len(self))))
+
+    def keywords(self, position):
+        start, end = self.keyword_offsets[position], self.keyword_offsets[position + 1]
+        return [self.keyword_vocabulary[code] for code in self.keyword_codes[start:end].tolist()]
+
+    def row(self, position):
+        """The idea at position as a dictionary in the SaaS_ideas.json shape."""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("IdeaTable index out of range")
+        return self.rows([position])[0]
+
+    def rows(self, positions):
+        """Idea dictionaries for the given positions, in that order."""
+        positions = np.asarray(positions, dtype=np.int64)
+        following = positions + 1
+        # Gather every column for all positions at once and convert to Python values in bulk
+        columns = zip(
+            self.titles.offsets[positions].tolist(), self.titles.offsets[following].tolist(),
+            self.descriptions.offsets[positions].tolist(), self.descriptions.offsets[following].tolist(),
+            self.keyword_offsets[positions].tolist(), self.keyword_offsets[following].tolist(),
+            self.searches[positions].tolist(), self.competition_codes[positions].tolist(), self.revenue[positions].tolist(),
+        )
+        titles, descriptions = self.titles.data, self.descriptions.data
+        vocabulary, categories = self.keyword_vocabulary, self.competition_categories
+        keyword_codes = self.keyword_codes
+        ideas = [
+            {
+                "product_title": titles[title_start:title_end].decode('utf-8'),
+                "description": descriptions[description_start:description_end].decode('utf-8'),
+                "keywords": [vocabulary[code] for code in keyword_codes[keywords_start:keywords_end].tolist()],
+                "avg_monthly_searches": None if searches == MISSING else searches,
+                "competition_level": categories[competition],
+                "revenue": None if revenue == MISSING else revenue,
+            }
+            for (title_start, title_end, description_start, description_end, keywords_start, keywords_end,
+                 searches, competition, revenue) in columns
+        ]
+
+        if self.extras:
+            for idea, position in zip(ideas, positions.tolist()):
+                extra = self.extras.get(position)
+                if extra:
+                    for key, value in extra.items():
+                        if value is _ABSENT:
+                            del idea[key]
+                        else:
+                            idea[key] = value
+        return ideas
+
+    def to_dicts(self):
+        return list(self)
+
+    def take(self, positions):
+        """New table with the rows at positions, in that order."""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.keyword_offsets[positions]
+        counts = self.keyword_offsets[positions + 1] - starts
+        keyword_offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(counts, out=keyword_offsets[1:])
+        keyword_codes = (np.concatenate([self.keyword_codes[start:start + count] for start, count in zip(starts.tolist(), counts.tolist())])
+                         if len(positions) else np.zeros(0, dtype=np.int32))
+        return IdeaTable(
+            self.titles.take(positions),
+            self.descriptions.take(positions),
+            self.keyword_vocabulary,
+            keyword_codes.astype(np.int32),
+            keyword_offsets,
+            self.searches[positions],
+            self.revenue[positions],
+            self.competition_categories,
+            self.competition_codes[positions],
+            {new: self.extras[old] for new, old in enumerate(positions.tolist()) if old in self.extras} if self.extras else None,
+        )
+
+    def sort_values(self, field):
+        """Array of the values field sorts by: avg_monthly_searches, revenue or competition_level (rank)."""
+        if field == 'avg_monthly_searches':
+            return self.searches
+        if field == 'revenue':
+            return self.revenue
+        if field == 'competition_level':
+            return self.competition_ranks
+        raise ValueError(f"Unknown sort field: {field}")
+
+    def argsort(self, field, descending=False):
+        """Positions ordered by field; equal values keep their order (reversed when descending)."""
+        order = np.argsort(self.sort_values(field), kind='stable')
+        return order[::-1] if descending else order
+
+    def range_mask(self, field, minimum=None, maximum=None):
+        """Rows whose field lies within [minimum, maximum]; missing values never match."""
+        values = self.sort_values(field)
+        mask = values >= (minimum if minimum is not None else 0)
+        if maximum is not None:
+            mask &= values <= maximum
+        return mask
+
+    def competition_mask(self, levels):
+        """Rows with one of the given competition levels."""
+        ranks = [COMPETITION_LEVELS.index(level) + 1 if level in COMPETITION_LEVELS else 0 for level in levels]
+        return np.isin(self.competition_ranks, ranks)
+
+    def contains_mask(self, needle, within=None):
+        """
+        Rows whose title or keywords contain needle, case-insensitively.
+
+        Parameters:
+            needle: Substring to look for.
+            within: Optional mask of rows other filters kept. Only these rows are checked
+                when they are few; otherwise the whole buffer is scanned and the caller
+                combines the masks.
+        """
+        needle = needle.lower()
+        mask = np.zeros(len(self), dtype=bool)
+        if not needle or _ROW_SEPARATOR in needle:
+            return mask
+
+        if self._search_buffer is None:
+            # Built straight from the columns, without materializing idea dictionaries
+            titles = self.titles.data
+            title_offsets = self.titles.offsets.tolist()
+            vocabulary = self.keyword_vocabulary
+            keyword_codes = self.keyword_codes.tolist()
+            keyword_offsets = self.keyword_offsets.tolist()
+            texts = [
+                ' '.join([titles[title_offsets[position]:title_offsets[position + 1]].decode('utf-8')]
+                         + [vocabulary[code] for code in keyword_codes[keyword_offsets[position]:keyword_offsets[position + 1]]])
+                .lower().replace(_ROW_SEPARATOR, ' ')
+                for position in range(len(self))
+            ]
+            # array.array keeps the offsets compact while bisect reads them without numpy overhead
+            self._search_starts = array('q', accumulate((len(text) + 1 for text in texts), initial=0))
+            self._search_buffer = _ROW_SEPARATOR.join(texts)
+
+        buffer, starts = self._search_buffer, self._search_starts
+        # Checking a row costs about as much as scanning WITHIN_SCAN_RATIO rows of the buffer
+        if within is not None and np.count_nonzero(within) * WITHIN_SCAN_RATIO < len(self):
+            for position in np.flatnonzero(within).tolist():
+                if buffer.find(needle, starts[position], starts[position + 1]) != -1:
+                    mask[position] = True
+            return mask
+
+        # str.find scans the whole buffer in C; after a match, continue at the next row
+        index = buffer.find(needle)
+        while index != -1:
+            position = bisect_right(starts, index) - 1
+            mask[position] = True
+            index = buffer.find(needle, starts[position + 1])
+        return mask
+
+    def filter(self, mask):
+        """New table with the rows where mask is True."""
+        return self.take(np.flatnonzero(mask))
+
+    def to_json(self, indent=2):
+        """The ideas as a JSON array, laid out like SaaS_ideas.json by default."""
+        return json.dumps(self.to_dicts(), indent=indent)
+
+    def write_csv(self, csv_file_path):
+        """Write the ideas in the SaaS_Niche_opportunities.csv format."""
+        json_to_csv.write_csv(self, csv_file_path)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the columns (keyword vocabulary and extras excluded)."""
+        return (self.titles.nbytes + self.descriptions.nbytes + self.keyword_codes.nbytes
+                + self.keyword_offsets.nbytes + self.searches.nbytes + self.revenue.nbytes
+                + self.competition_codes.nbytes + self.competition_ranks.nbytes)
+
+
+def load_json_table(f):
+    """CachedDataset loader: parse a SaaS_ideas.json file object into an IdeaTable."""
+    content = f.read().strip()
+    return IdeaTable.from_ideas(json.loads(content) if content else [])
@@ -0,0 +1,148 @@
+import threading
+from idea_search import IdeaSearchIndex
+from idea_table import IdeaTable
+
+# Fields that can be used for server-side sorting
+SORTABLE_FIELDS = ['avg_monthly_searches', 'revenue', 'competition_level']
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Query parameters that switch /api/saas-ideas into paginated mode
+QUERY_PARAMS = [
+    'page', 'limit', 'sort', 'order', 'q', 'competition',
+    'min_searches', 'max_searches', 'min_revenue', 'max_revenue',
+]
+
+
+class IdeaIndex:
+    """
+    Sort orders and filters over an IdeaTable of SaaS ideas.
+
+    Built once per dataset version: each sort order is a precomputed position array, and
+    filters are vectorized masks over the table's columns, so a query only materializes
+    the idea dictionaries of the page it returns.
+    """
+
+    def __init__(self, ideas):
+        """
+        Parameters:
+            ideas: An IdeaTable, or a list of idea dictionaries to build one from.
+        """
+        self.ideas = ideas if isinstance(ideas, IdeaTable) else IdeaTable.from_ideas(ideas)
+        self.orders = {field: self.ideas.argsort(field) for field in SORTABLE_FIELDS}
+
+        # Full-text index, built on the first search so plain listing doesn't pay for it
+        self._search_index = None
+        self._search_lock = threading.Lock()
+
+    def search_index(self):
+        """Return the IdeaSearchIndex over these ideas, building it on first use."""
+        with self._search_lock:
+            if self._search_index is None:
+                self._search_index = IdeaSearchIndex(self.ideas)
+            return self._search_index
+
+    def query(self, sort='avg_monthly_searches', order='desc', page=1, limit=DEFAULT_PAGE_SIZE,
+              q=None, competition=None, min_searches=None, max_searches=None,
+              min_revenue=None, max_revenue=None):
+        """
+        Return one page of ideas matching the given filters.
+
+        Parameters:
+            sort: One of SORTABLE_FIELDS.
+            order: 'asc' or 'desc'.
+            page: 1-based page number.
+            limit: Number of ideas per page.
+            q: Case-insensitive substring matched against titles and keywords.
+            competition: List of competition level strings to keep.
+            min_searches, max_searches, min_revenue, max_revenue: Inclusive numeric bounds.
+
+        Returns:
+            Dictionary with the page of ideas and pagination metadata
+        """
+        mask = None
+
+        def restrict(rows):
+            nonlocal mask
+            mask = rows if mask is None else mask & rows
+
+        if min_searches is not None or max_searches is not None:
+            restrict(self.ideas.range_mask('avg_monthly_searches', min_searches, max_searches))
+        if min_revenue is not None or max_revenue is not None:
+            restrict(self.ideas.range_mask('revenue', min_revenue, max_revenue))
+        if competition:
+            restrict(self.ideas.competition_mask(competition))
+        if q:
+            # Substring matching is the slowest filter, so it only checks rows the others kept
+            restrict(self.ideas.contains_mask(q, within=mask))
+
+        # Descending is the ascending order reversed, so ties come out in reverse position order
+        ordered = self.orders[sort]
+        if order == 'desc':
+            ordered = ordered[::-1]
+        if mask is not None:
+            ordered = ordered[mask[ordered]]
+
+        total = len(ordered)
+        start = (page - 1) * limit
+        pages = (total + limit - 1) // limit
+
+        return {
+            "ideas": self.ideas.rows(ordered[start:start + limit]),
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "pages": pages,
+            "next_page": page + 1 if page < pages else None,
+        }
+
+
+def parse_query_args(args):
+    """
+    Parse and validate request query arguments for IdeaIndex.query.
+
+    Parameters:
+        args: Flask request.args mapping.
+
+    Returns:
+        Dictionary of keyword arguments for IdeaIndex.query
+
+    Raises:
+        ValueError: If an argument has an invalid value
+    """
+    sort = args.get('sort', 'avg_monthly_searches')
+    if sort not in SORTABLE_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORTABLE_FIELDS)}")
+
+    order = args.get('order', 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+
+    def int_arg(name, default=None, minimum=None):
+        raw = args.get(name)
+        if raw is None or raw == '':
+            return default
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer")
+        if minimum is not None and value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}")
+        return value
+
+    competition = args.get('competition')
+    competition = [level.strip() for level in competition.split(',') if level.strip()] if competition else None
+
+    return {
+        "sort": sort,
+        "order": order,
+        "page": int_arg('page', 1, minimum=1),
+        "limit": min(int_arg('limit', DEFAULT_PAGE_SIZE, minimum=1), MAX_PAGE_SIZE),
+        "q": args.get('q') or None,
+        "competition": competition,
+        "min_searches": int_arg('min_searches', minimum=0),
+        "max_searches": int_arg('max_searches', minimum=0),
+        "min_revenue": int_arg('min_revenue', minimum=0),
+        "max_revenue": int_arg('max_revenue', minimum=0),
+    }
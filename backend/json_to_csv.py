@@ -1,48 +1,89 @@
-import json
 import csv
 import os
+import tempfile
+from paths import get_data_dir
 
-def json_to_csv():
+CSV_HEADER = ['SaaS Niche', 'Monthly Keyword Searches', 'Evaluation of Competition', 'Approximated Revenue']
+
+def iter_csv_rows(saas_ideas):
+    """
+    Convert SaaS ideas into CSV rows one at a time.
+    
+    Parameters:
+        saas_ideas: Any iterable of idea dictionaries (a list or a streaming generator).
+    """
+    for idea in saas_ideas:
+        # Extract product title
+        saas_niche = idea.get('product_title', 'Untitled Product')
+        
+        # Format monthly searches with commas
+        monthly_searches = idea.get('avg_monthly_searches', 0)
+        formatted_searches = f"{monthly_searches:,}" if monthly_searches else "0"
+        
+        # Get competition level
+        competition = idea.get('competition_level', 'Unknown')
+        
+        # Format revenue as currency
+        revenue = idea.get('revenue', 0)
+        formatted_revenue = f"${revenue:,}/month" if revenue else "$0/month"
+        
+        yield [saas_niche, formatted_searches, competition, formatted_revenue]
+
+def write_csv(saas_ideas, csv_file_path):
+    """
+    Stream SaaS ideas into a CSV file with constant memory use.
+    The file is written to a temporary file and renamed into place, so readers
+    never see a partially written CSV.
+    
+    Parameters:
+        saas_ideas: Any iterable of idea dictionaries.
+        csv_file_path: Destination of the CSV file.
+    
+    Returns:
+        Number of rows written
+    """
+    directory = os.path.dirname(csv_file_path)
+    os.makedirs(directory, exist_ok=True)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.SaaS_Niche_opportunities.', suffix='.tmp')
+    row_count = 0
+    try:
+        with os.fdopen(fd, 'w', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(CSV_HEADER)
+            for row in iter_csv_rows(saas_ideas):
+                csv_writer.writerow(row)
+                row_count += 1
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+        os.replace(tmp_path, csv_file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    return row_count
+
+def json_to_csv(saas_ideas=None):
     """
     Convert SaaS ideas from JSON to CSV format.
     The CSV will have columns: SaaS Niche, Monthly Keyword Searches, Evaluation of Competition, Approximated Revenue
+    
+    Parameters:
+        saas_ideas: Optional iterable of ideas to export (e.g. a generator over the idea store).
+            Defaults to streaming every idea from the idea store in the data directory.
     """
     # Define file paths
-    json_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'SaaS_ideas.json')
-    csv_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'csv', 'SaaS_Niche_opportunities.csv')
-    
-    # Ensure the csv directory exists
-    os.makedirs(os.path.dirname(csv_file_path), exist_ok=True)
+    data_dir = get_data_dir()
+    json_file_path = os.path.join(data_dir, 'SaaS_ideas.json')
+    csv_file_path = os.path.join(data_dir, 'csv', 'SaaS_Niche_opportunities.csv')
     
-    # Load JSON data
-    with open(json_file_path, 'r') as json_file:
-        saas_ideas = json.load(json_file)
+    # Stream ideas from the idea store (SaaS_ideas.json is imported into it on first use)
+    if saas_ideas is None:
+        from idea_store import IdeaStore  # idea_store imports idea_table, which imports this module
+        saas_ideas = IdeaStore(os.path.join(data_dir, 'ideas.db'), json_file_path).iter_ideas()
     
-    # Write to CSV
-    with open(csv_file_path, 'w', newline='') as csv_file:
-        csv_writer = csv.writer(csv_file)
-        
-        # Write header
-        csv_writer.writerow(['SaaS Niche', 'Monthly Keyword Searches', 'Evaluation of Competition', 'Approximated Revenue'])
-        
-        # Write data rows
-        for idea in saas_ideas:
-            # Extract product title
-            saas_niche = idea.get('product_title', 'Untitled Product')
-            
-            # Format monthly searches with commas
-            monthly_searches = idea.get('avg_monthly_searches', 0)
-            formatted_searches = f"{monthly_searches:,}" if monthly_searches else "0"
-            
-            # Get competition level
-            competition = idea.get('competition_level', 'Unknown')
-            
-            # Format revenue as currency
-            revenue = idea.get('revenue', 0)
-            formatted_revenue = f"${revenue:,}/month" if revenue else "$0/month"
-            
-            # Write the row
-            csv_writer.writerow([saas_niche, formatted_searches, competition, formatted_revenue])
+    write_csv(saas_ideas, csv_file_path)
     
     print(f"CSV file created successfully at: {csv_file_path}")
     return csv_file_path
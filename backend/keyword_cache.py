@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# SQLite limits the number of parameters per statement, so lookups are chunked
+LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_keyword(keyword):
+    """Normalize a keyword for caching: lowercase with collapsed whitespace."""
+    return ' '.join(str(keyword).lower().split())
+
+
+class KeywordCache:
+    """
+    Persistent keyword -> metrics cache so repeated keywords don't cost DataForSEO operations.
+
+    Entries older than the TTL are treated as missing and get re-fetched. The database
+    also keeps the number of DataForSEO operations spent per UTC day, shared by every
+    process that fetches metrics.
+    """
+
+    def __init__(self, db_path, ttl_seconds):
+        """
+        Parameters:
+            db_path: Path of the SQLite database file.
+            ttl_seconds: How long fetched metrics stay valid.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS keyword_metrics (
+                    keyword TEXT PRIMARY KEY,
+                    metrics TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_operations (
+                    day TEXT PRIMARY KEY,
+                    operations INTEGER NOT NULL
+                )
+            """)
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keywords, include_expired=False):
+        """
+        Look up cached metrics.
+
+        Parameters:
+            keywords: List of normalized keywords.
+            include_expired: Also return entries older than the TTL. Entries are never
+                deleted, so this gives the last known metrics of every keyword.
+
+        Returns:
+            Dictionary of keyword -> metrics for keywords with a (fresh) cache entry
+        """
+        results = {}
+        oldest_allowed = 0 if include_expired else time.time() - self.ttl_seconds
+        conn = self._connection()
+
+        for i in range(0, len(keywords), LOOKUP_CHUNK_SIZE):
+            chunk = keywords[i:i+LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT keyword, metrics FROM keyword_metrics WHERE fetched_at >= ? AND keyword IN ({placeholders})",
+                [oldest_allowed] + chunk
+            )
+            for keyword, metrics in rows:
+                results[keyword] = json.loads(metrics)
+
+        return results
+
+    def put_many(self, metrics_by_keyword):
+        """Store freshly fetched metrics for normalized keywords."""
+        if not metrics_by_keyword:
+            return
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO keyword_metrics (keyword, metrics, fetched_at) VALUES (?, ?, ?)",
+                [(keyword, json.dumps(metrics), now) for keyword, metrics in metrics_by_keyword.items()]
+            )
+
+    def add_operations(self, day, count):
+        """
+        Add billed DataForSEO operations to a day's total.
+
+        Returns:
+            The day's new total
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO daily_operations (day, operations) VALUES (?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET operations = operations + excluded.operations",
+                (day, count)
+            )
+            return conn.execute("SELECT operations FROM daily_operations WHERE day = ?", (day,)).fetchone()[0]
+
+    def operations_on(self, day):
+        """Number of DataForSEO operations recorded for a day (YYYY-MM-DD, UTC)."""
+        row = self._connection().execute("SELECT operations FROM daily_operations WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
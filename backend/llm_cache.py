@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+EVICTION_CHUNK = 100  # least recently used entries deleted per eviction step
+
+
+def cache_key(model, system_prompt, user_content):
+    """SHA-256 of everything that determines a completion: model, system prompt and prompt."""
+    payload = json.dumps([model, system_prompt, user_content], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of OpenAI responses keyed by cache_key, so re-running the same prompt
+    (after a crash, in a backfill or in an experiment) costs no tokens.
+
+    The cache is bounded by size: when the stored responses exceed max_bytes, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, db_path, max_bytes):
+        """
+        Parameters:
+            db_path: Path of the SQLite database file.
+            max_bytes: Maximum total size of stored responses and ideas.
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    ideas TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used)")
+            self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Returns:
+            Tuple of (raw response, parsed ideas), or None on a miss
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT response, ideas FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        with conn:
+            conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0], json.loads(row[1])
+
+    def put(self, key, model, response, ideas):
+        """Store a response and its parsed ideas, evicting old entries beyond max_bytes."""
+        ideas_json = json.dumps(ideas)
+        size = len(response.encode('utf-8')) + len(ideas_json.encode('utf-8'))
+        now = time.time()
+        conn = self._connection()
+
+        with self._lock, conn:
+            previous = conn.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, ideas, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response, ideas_json, size, now, now)
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+
+            while self.total_bytes > self.max_bytes:
+                evicted = conn.execute(
+                    "SELECT key, size FROM llm_responses WHERE key != ? ORDER BY last_used LIMIT ?",
+                    (key, EVICTION_CHUNK)
+                ).fetchall()
+                if not evicted:
+                    break
+                for evicted_key, evicted_size in evicted:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (evicted_key,))
+                    self.total_bytes -= evicted_size
+                    if self.total_bytes <= self.max_bytes:
+                        break
@@ -0,0 +1,172 @@
+import numpy as np
+import google_ads_metrics
+from keyword_cache import normalize_keyword
+
+# Numeric score of each competition level, used to average competition across keywords
+COMPETITION_SCORES = {
+    "Very Low": 10,
+    "Low": 30,
+    "Moderate": 50,
+    "High": 70,
+    "Very High": 90,
+}  # N/A or anything else scores 0
+
+# Lower bounds of "Low", "Moderate", "High" and "Very High" (see google_ads_metrics.map_competition)
+COMPETITION_BINS = np.array([20, 40, 60, 80])
+COMPETITION_LABELS = np.array(["Very Low", "Low", "Moderate", "High", "Very High"], dtype=object)
+COMPETITION_LABEL_SCORES = np.array([COMPETITION_SCORES[label] for label in COMPETITION_LABELS], dtype=float)
+
+
+def competition_bins(values):
+    """Index into COMPETITION_LABELS for an array of 0-100 competition values."""
+    return np.searchsorted(COMPETITION_BINS, np.asarray(values, dtype=float), side='right')
+
+
+def map_competition_levels(values):
+    """Vectorized google_ads_metrics.map_competition for an array of 0-100 competition values."""
+    return COMPETITION_LABELS[competition_bins(values)]
+
+
+def build_keyword_mapping(ideas, known_keywords, key=None):
+    """
+    Build a sparse idea <-> keyword mapping as two parallel index arrays.
+
+    Parameters:
+        ideas: List of idea dictionaries.
+        known_keywords: Container of keywords that have metrics.
+        key: Optional function applied to each idea keyword before lookup (e.g. normalize_keyword).
+
+    Returns:
+        Tuple of (idea_index, keyword_index, keywords) where keyword_index points into
+        the list of distinct keywords
+    """
+    keyword_positions = {}
+    idea_index = []
+    keyword_index = []
+
+    for i, idea in enumerate(ideas):
+        for keyword in idea.get('keywords') or []:
+            if key:
+                keyword = key(keyword)
+            if keyword in known_keywords:
+                idea_index.append(i)
+                keyword_index.append(keyword_positions.setdefault(keyword, len(keyword_positions)))
+
+    return (
+        np.array(idea_index, dtype=np.int64),
+        np.array(keyword_index, dtype=np.int64),
+        list(keyword_positions),
+    )
+
+
+def aggregate_keyword_values(idea_index, keyword_index, idea_count, search_volumes, competition_scores, revenues):
+    """
+    Aggregate per-keyword values into per-idea metrics.
+
+    Parameters:
+        idea_index, keyword_index: Sparse mapping from build_keyword_mapping.
+        idea_count: Number of ideas.
+        search_volumes, competition_scores, revenues: Arrays indexed by keyword.
+
+    Returns:
+        Tuple of (counts, search_sums, mean_competition, mean_revenue) arrays indexed by idea
+    """
+    counts = np.bincount(idea_index, minlength=idea_count)
+    safe_counts = np.maximum(counts, 1)
+
+    search_sums = np.bincount(idea_index, weights=search_volumes[keyword_index], minlength=idea_count)
+    mean_competition = np.bincount(idea_index, weights=competition_scores[keyword_index], minlength=idea_count) / safe_counts
+    mean_revenue = np.bincount(idea_index, weights=revenues[keyword_index], minlength=idea_count) / safe_counts
+
+    return counts, search_sums, mean_competition, mean_revenue
+
+
+def aggregate_idea_metrics(ideas, keyword_metrics):
+    """
+    Set avg_monthly_searches, competition_level and revenue on every idea at once:
+    search volumes are summed, competition scores and revenues averaged across
+    the idea's keywords. Ideas without any known keyword are left unchanged.
+
+    Parameters:
+        ideas: List of idea dictionaries, updated in place.
+        keyword_metrics: Dictionary of keyword -> [avg_searches, competition_level, revenue].
+
+    Returns:
+        The list of ideas
+    """
+    idea_index, keyword_index, keywords = build_keyword_mapping(ideas, keyword_metrics)
+    if not keywords:
+        return ideas
+
+    metrics = [keyword_metrics[keyword] for keyword in keywords]
+    search_volumes = np.array([m[0] for m in metrics], dtype=float)
+    competition_scores = np.array([COMPETITION_SCORES.get(m[1], 0) for m in metrics], dtype=float)
+    revenues = np.array([m[2] for m in metrics], dtype=float)
+
+    return apply_aggregates(ideas, *aggregate_keyword_values(
+        idea_index, keyword_index, len(ideas), search_volumes, competition_scores, revenues
+    ))
+
+
+def recompute_idea_metrics(ideas, raw_metrics, **model_params):
+    """
+    Re-derive every idea's metrics from raw per-keyword metrics, without calling the API.
+    Revenue is computed for all keywords at once with the given model parameters.
+
+    Parameters:
+        ideas: List of idea dictionaries, updated in place.
+        raw_metrics: Dictionary of normalized keyword -> raw metrics from the keyword cache.
+        model_params: approximate_revenue parameters (CR, B, alpha, k, beta).
+
+    Returns:
+        Tuple of (ideas, number of keywords that only had pre-derived metrics)
+    """
+    idea_index, keyword_index, keywords = build_keyword_mapping(ideas, raw_metrics, key=normalize_keyword)
+    if not keywords:
+        return ideas, 0
+
+    count = len(keywords)
+    search_volumes = np.zeros(count)
+    competition_index = np.zeros(count)
+    has_data = np.zeros(count, dtype=bool)
+    legacy_scores = np.zeros(count)
+    legacy_revenues = np.zeros(count)
+    is_legacy = np.zeros(count, dtype=bool)
+
+    for i, keyword in enumerate(keywords):
+        raw = raw_metrics[keyword]
+        if isinstance(raw, list):
+            # Cached before raw metrics were kept - revenue can't be re-derived
+            is_legacy[i] = True
+            search_volumes[i] = raw[0]
+            legacy_scores[i] = COMPETITION_SCORES.get(raw[1], 0)
+            legacy_revenues[i] = raw[2]
+        elif raw.get("search_volume"):
+            has_data[i] = True
+            search_volumes[i] = raw["search_volume"]
+            competition_index[i] = raw.get("competition_index") or 0
+
+    # Keywords without data keep the dummy values: 0 searches, "N/A" (score 0), $0
+    revenues = np.where(has_data, google_ads_metrics.approximate_revenue(search_volumes, competition_index, **model_params), 0)
+    competition_scores = np.where(has_data, COMPETITION_LABEL_SCORES[competition_bins(competition_index)], 0)
+    revenues = np.where(is_legacy, legacy_revenues, revenues).astype(float)
+    competition_scores = np.where(is_legacy, legacy_scores, competition_scores)
+
+    apply_aggregates(ideas, *aggregate_keyword_values(
+        idea_index, keyword_index, len(ideas), search_volumes, competition_scores, revenues
+    ))
+    return ideas, int(is_legacy.sum())
+
+
+def apply_aggregates(ideas, counts, search_sums, mean_competition, mean_revenue):
+    """Write aggregated metrics onto every idea that has at least one known keyword."""
+    competition_levels = map_competition_levels(mean_competition)
+
+    for i in np.flatnonzero(counts):
+        idea = ideas[i]
+        idea['avg_monthly_searches'] = int(search_sums[i])  # don't average, just sum
+        idea['competition_level'] = competition_levels[i]
+        idea['revenue'] = int(mean_revenue[i])
+
+    return ideas
+
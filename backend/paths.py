@@ -0,0 +1,15 @@
+import os
+
+
+def get_data_dir():
+    """
+    Determine the data directory used by the pipeline scripts.
+    Scripts are run either from the project root or from the backend directory.
+    """
+    # If running from backend directory, go up one level
+    if os.path.basename(os.getcwd()) == 'backend':
+        base_dir = os.path.dirname(os.getcwd())
+    else:
+        base_dir = os.getcwd()  # Assume we're already at the root
+
+    return os.path.join(base_dir, 'data')
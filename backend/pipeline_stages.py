@@ -0,0 +1,196 @@
+import time
+import queue
+import threading
+
+# What a stage does when its input queue is full
+BLOCK = 'block'  # the producer waits (backpressure)
+DROP_OLDEST = 'drop_oldest'  # the oldest queued item is discarded
+
+
+class StageMetrics:
+    """Counters and timings of one stage, updated by its workers."""
+
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.emitted = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            done = self.processed + self.failed
+            return {
+                "received": self.received,
+                "processed": self.processed,
+                "emitted": self.emitted,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "avg_seconds": self.busy_seconds / done if done else 0.0,
+                "max_seconds": self.max_seconds,
+                "avg_wait_seconds": self.wait_seconds / done if done else 0.0,
+                "busy_seconds": self.busy_seconds,
+            }
+
+
+class Stage:
+    """
+    One step of a pipeline: a bounded input queue drained by its own worker threads.
+
+    The handler is called with each item and returns the item to pass to the next stage,
+    or None to pass nothing on. A handler may also forward items itself through
+    Stage.put on another stage (e.g. a batcher flushing on a timer).
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=100, overflow=BLOCK):
+        """
+        Parameters:
+            name: Name used in logs and metrics.
+            handler: Function item -> output item or None.
+            workers: Number of worker threads.
+            queue_size: Capacity of the input queue.
+            overflow: BLOCK or DROP_OLDEST, applied when the input queue is full.
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.downstream = None
+        self.metrics = StageMetrics()
+        self._in_flight = {}  # worker thread name -> item being processed
+        self._threads = []
+
+    def connect(self, stage):
+        """Send this stage's output to stage. Returns stage, so calls can be chained."""
+        self.downstream = stage
+        return stage
+
+    def put(self, item):
+        """Queue an item for this stage, blocking or dropping the oldest item when full."""
+        entry = (time.monotonic(), item)
+        with self.metrics._lock:
+            self.metrics.received += 1
+
+        if self.overflow == BLOCK:
+            self.queue.put(entry)
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(entry)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    with self.metrics._lock:
+                        self.metrics.dropped += 1
+                    print(f"Stage '{self.name}' queue full - dropped the oldest item.")
+                except queue.Empty:
+                    pass
+
+    def process(self, item, queued_at=None):
+        """Run the handler on one item, record metrics and forward the output."""
+        start = time.monotonic()
+        try:
+            output = self.handler(item)
+        except Exception as e:
+            output = None
+            failed = True
+            print(f"Error in pipeline stage '{self.name}': {e}")
+        else:
+            failed = False
+        elapsed = time.monotonic() - start
+
+        with self.metrics._lock:
+            if failed:
+                self.metrics.failed += 1
+            else:
+                self.metrics.processed += 1
+            self.metrics.busy_seconds += elapsed
+            self.metrics.max_seconds = max(self.metrics.max_seconds, elapsed)
+            if queued_at is not None:
+                self.metrics.wait_seconds += start - queued_at
+            if output is not None:
+                self.metrics.emitted += 1
+
+        if output is not None and self.downstream is not None:
+            self.downstream.put(output)
+        return output
+
+    def _work(self):
+        name = threading.current_thread().name
+        while True:
+            queued_at, item = self.queue.get()
+            self._in_flight[name] = item
+            try:
+                self.process(item, queued_at)
+            finally:
+                self._in_flight.pop(name, None)
+                self.queue.task_done()
+
+    def pending_items(self):
+        """Items being processed or waiting in the queue, e.g. for checkpointing."""
+        with self.queue.mutex:
+            queued = [item for _, item in self.queue.queue]
+        return list(self._in_flight.values()) + queued
+
+    def start(self):
+        """Start the stage's daemon worker threads."""
+        for i in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{len(self._threads)}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def join(self):
+        """Wait until every queued item has been processed."""
+        self.queue.join()
+
+
+class Pipeline:
+    """A chain of stages, fed through the first one."""
+
+    def __init__(self, stages):
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.connect(downstream)
+
+    def __getitem__(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def put(self, item):
+        self.stages[0].put(item)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def join(self):
+        """Wait until every stage has drained its queue, upstream first."""
+        for stage in self.stages:
+            stage.join()
+
+    def metrics(self):
+        """Metrics of every stage, including its current queue depth."""
+        return {
+            stage.name: dict(stage.metrics.snapshot(), queued=stage.queue.qsize(), workers=stage.workers)
+            for stage in self.stages
+        }
+
+    def log_metrics(self):
+        for name, metrics in self.metrics().items():
+            print(f"Stage {name}: {metrics['processed']} processed, {metrics['emitted']} emitted, "
+                  f"{metrics['failed']} failed, {metrics['dropped']} dropped, {metrics['queued']} queued, "
+                  f"avg {metrics['avg_seconds']:.3f}s (max {metrics['max_seconds']:.3f}s), "
+                  f"avg wait {metrics['avg_wait_seconds']:.3f}s")
@@ -0,0 +1,64 @@
+import os
+import time
+import sqlite3
+import threading
+
+# SQLite limits the number of parameters per statement, so lookups are chunked
+LOOKUP_CHUNK_SIZE = 500
+
+
+class ProcessedComments:
+    """
+    Persistent set of Reddit comment ids the pipeline has already looked at, shared by
+    the live stream and the backfill command so no comment is sent to OpenAI twice.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS processed_comments (
+                    id TEXT PRIMARY KEY,
+                    processed_at REAL NOT NULL
+                )
+            """)
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_if_new(self, comment_id):
+        """
+        Record a comment id.
+
+        Returns:
+            True if the id wasn't recorded before
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO processed_comments (id, processed_at) VALUES (?, ?)",
+                (comment_id, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def filter_new(self, comment_ids):
+        """Return the ids that haven't been recorded yet, without recording them."""
+        seen = set()
+        conn = self._connection()
+        for i in range(0, len(comment_ids), LOOKUP_CHUNK_SIZE):
+            chunk = comment_ids[i:i+LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(f"SELECT id FROM processed_comments WHERE id IN ({placeholders})", chunk)
+            seen.update(comment_id for comment_id, in rows)
+        return [comment_id for comment_id in comment_ids if comment_id not in seen]
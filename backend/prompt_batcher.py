@@ -0,0 +1,177 @@
+import time
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # optional - fall back to a character-based estimate
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4  # rough ratio for English text, used without tiktoken
+TOKENIZER_ENCODING = 'o200k_base'  # encoding of the gpt-4o model family
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in text, exactly when tiktoken is installed."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to roughly max_tokens tokens."""
+    if tiktoken is not None:
+        estimate_tokens('')  # make sure the encoding is loaded
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+class PromptBatcher:
+    """
+    Packs scored texts into prompts that fit a token budget.
+
+    Texts are collected until they add up to candidate_factor budgets (or the oldest has
+    waited max_latency seconds); then the highest-scoring texts that fit the budget are
+    joined into one prompt and handed to the flush callback, and the rest are dropped.
+    """
+
+    def __init__(self, on_flush, token_budget, max_latency, candidate_factor=1, separator='\n\n'):
+        """
+        Parameters:
+            on_flush: Function called with each prompt string (outside the batcher's lock).
+            token_budget: Estimated tokens of texts per prompt.
+            max_latency: Seconds after which a partly filled prompt is flushed anyway.
+            candidate_factor: Texts worth this many budgets are ranked before a size flush.
+            separator: String placed after every text.
+        """
+        self.on_flush = on_flush
+        self.token_budget = token_budget
+        self.max_latency = max_latency
+        self.candidate_tokens = token_budget * candidate_factor
+        self.separator = separator
+        self.separator_tokens = estimate_tokens(separator)
+        self.pending = []  # (score, tokens, text)
+        self.pending_tokens = 0
+        self.oldest_time = None
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, text, score=0):
+        """
+        Add a text to the next prompt.
+
+        Returns:
+            Estimated tokens of the text (after truncation to the budget)
+        """
+        tokens = estimate_tokens(text)
+        if tokens > self.token_budget:
+            text = truncate_to_tokens(text, self.token_budget - self.separator_tokens)
+            tokens = estimate_tokens(text)
+
+        prompt = None
+        with self._lock:
+            self.pending.append((score, tokens + self.separator_tokens, text))
+            self.pending_tokens += tokens + self.separator_tokens
+            if self.oldest_time is None:
+                self.oldest_time = time.monotonic()
+            if self.pending_tokens >= self.candidate_tokens:
+                prompt = self._take_prompt()
+
+        if prompt:
+            self.on_flush(prompt)
+        return tokens
+
+    def _take_prompt(self):
+        """Pack the best pending texts into a prompt and clear the buffer. Call with the lock held."""
+        ranked = sorted(self.pending, key=lambda item: item[0], reverse=True)
+        selected, used = [], 0
+        for score, tokens, text in ranked:
+            if used + tokens <= self.token_budget:
+                selected.append(text)
+                used += tokens
+
+        dropped = len(self.pending) - len(selected)
+        if dropped:
+            print(f"Prompt batcher kept {len(selected)} of {len(self.pending)} comments (~{used} tokens)")
+
+        self.pending = []
+        self.pending_tokens = 0
+        self.oldest_time = None
+        return ''.join(text + self.separator for text in selected)
+
+    def pending_items(self):
+        """(score, text) tuples waiting for the next prompt, e.g. for checkpointing."""
+        with self._lock:
+            return [(score, text) for score, _, text in self.pending]
+
+    def flush(self):
+        """Flush pending texts now, if there are any."""
+        with self._lock:
+            prompt = self._take_prompt() if self.pending else None
+        if prompt:
+            self.on_flush(prompt)
+
+    def flush_if_stale(self):
+        """Flush pending texts if the oldest has waited at least max_latency seconds."""
+        with self._lock:
+            stale = self.oldest_time is not None and time.monotonic() - self.oldest_time >= self.max_latency
+            prompt = self._take_prompt() if stale else None
+        if prompt:
+            print("Flushing partly filled prompt after max latency")
+            self.on_flush(prompt)
+
+    def start(self, check_interval=None):
+        """Start a daemon thread that flushes stale prompts."""
+        if self._timer is not None:
+            return self._timer
+        interval = check_interval or max(min(self.max_latency / 10, 30), 0.1)
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush_if_stale()
+                except Exception as e:
+                    print(f"Error flushing stale prompt: {e}")
+
+        self._timer = threading.Thread(target=watch, name="prompt-batcher-timer", daemon=True)
+        self._timer.start()
+        return self._timer
+
+
+class TokenUsage:
+    """Thread-safe running totals of OpenAI token usage."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        """
+        Add the usage of one completion (completion.usage); missing usage is ignored.
+
+        Returns:
+            Tuple of (prompt tokens, completion tokens) of this request
+        """
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        return prompt_tokens, completion_tokens
+
+    def summary(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
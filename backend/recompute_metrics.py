@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Script to recompute avg_monthly_searches, competition_level and revenue for every idea
+from the raw keyword metrics stored in the keyword cache. No API operations are used,
+so revenue model parameters can be tuned and applied to the whole dataset in seconds.
+
+The keyword cache is the system of record for raw metrics: keywords that were never
+cached, or were cached before raw metrics were stored, keep their current metrics.
+
+Example:
+    python recompute_metrics.py --cr 0.02 --beta 0.3
+"""
+
+import os
+import time
+import argparse
+import google_ads_metrics
+import metric_aggregation
+import json_to_csv
+from idea_store import IdeaStore
+from keyword_cache import normalize_keyword
+from paths import get_data_dir
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute idea metrics offline with new revenue model parameters.")
+    parser.add_argument('--cr', type=float, default=0.01, help="conversion rate from searcher to paying customer")
+    parser.add_argument('--b', type=float, default=50, help="baseline price per customer in dollars")
+    parser.add_argument('--alpha', type=float, default=1.0, help="demand sensitivity factor")
+    parser.add_argument('--k', type=float, default=1000, help="saturation constant for demand")
+    parser.add_argument('--beta', type=float, default=0.2, help="competition sensitivity factor")
+    parser.add_argument('--dry-run', action='store_true', help="compute and report without saving")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    # Opened directly rather than through reddit_pipeline, which needs API credentials
+    data_dir = get_data_dir()
+    ideas_json_path = os.path.join(data_dir, 'SaaS_ideas.json')
+    idea_store = IdeaStore(os.path.join(data_dir, 'ideas.db'), ideas_json_path)
+
+    ideas = list(idea_store.iter_ideas(include_id=True))
+    keywords = list({normalize_keyword(keyword) for idea in ideas for keyword in idea['keywords']})
+    raw_metrics = google_ads_metrics.keyword_cache.get_many(keywords, include_expired=True)
+    print(f"Loaded {len(ideas)} ideas and raw metrics for {len(raw_metrics)} of {len(keywords)} keywords.")
+
+    ideas, legacy_count = metric_aggregation.recompute_idea_metrics(
+        ideas, raw_metrics, CR=args.cr, B=args.b, alpha=args.alpha, k=args.k, beta=args.beta
+    )
+    if legacy_count:
+        print(f"{legacy_count} keywords were cached before raw metrics were stored and keep their old revenue.")
+
+    print(f"Recomputed metrics in {time.perf_counter() - start:.3f}s.")
+
+    if args.dry_run:
+        total_revenue = sum(idea['revenue'] or 0 for idea in ideas)
+        print(f"Dry run - nothing saved. Total estimated revenue: ${total_revenue:,}/month")
+    else:
+        idea_store.update_metrics(ideas)
+        count = idea_store.export_json(ideas_json_path)
+        print(f"Exported {count} ideas to: {ideas_json_path}")
+        json_to_csv.json_to_csv(idea_store.iter_ideas())
+        print("Process completed.")
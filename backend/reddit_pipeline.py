@@ -2,24 +2,75 @@ import os
 from dotenv import load_dotenv
 import praw
 import time
+import random
+import openai
 from openai import OpenAI
 import threading
-import json
 import google_ads_metrics
+import metric_aggregation
+import json_to_csv
+import comment_filter
+import metrics
+from prompt_batcher import PromptBatcher, TokenUsage
+from pipeline_stages import Stage, Pipeline, BLOCK, DROP_OLDEST
+from subreddit_streams import MultiplexedStream
+from checkpoint import Checkpoint, SavedComment, save_comment
+from processed_comments import ProcessedComments
+from llm_cache import LLMResponseCache, cache_key
+from response_decoder import decode_ideas, DecodeStats
+from idea_store import IdeaStore
+from idea_dedup import IdeaDeduplicator
+from keyword_cache import normalize_keyword
+from paths import get_data_dir
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Settings
-COMMENTS_PER_OPENAI_REQUEST = 10
+PROMPT_TOKEN_BUDGET = 3000  # estimated tokens of comments per OpenAI request
+PROMPT_CANDIDATE_FACTOR = 2  # comments worth this many budgets are ranked before the best are sent
+PROMPT_MAX_LATENCY = 900  # seconds before a partly filled prompt is sent anyway
 MIN_WORD_COUNT = 20
 COMMENT_COOLDOWN = 30  # minimum seconds between fetching comments (per individual subreddit)
 BATCH_SIZE_FOR_KEYWORD_ANALYSIS = 250  # number of ideas to generate metrics for at once (max 300)
+EXPORT_INTERVAL = 300  # minimum seconds between exports of SaaS_ideas.json after appending ideas
+FILTER_WORKERS = 2  # threads scoring incoming comments
+COMMENT_QUEUE_SIZE = 1000  # max comments waiting per stage before the stream blocks
+GENERATION_WORKERS = 3  # number of concurrent OpenAI requests
+GENERATION_QUEUE_SIZE = 20  # max comment batches waiting for generation before the oldest is dropped
+IDEA_QUEUE_SIZE = 100  # max generated idea lists waiting to be stored or enriched
+PIPELINE_METRICS_INTERVAL = 300  # seconds between pipeline stage metrics in the log
+GPT_MODEL = "gpt-4o-mini"
+GPT_MAX_RETRIES = 5  # retries for rate-limited or transient OpenAI errors
+GPT_BACKOFF_BASE = 2  # seconds, doubled after every retry
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', 200))  # disk budget of the OpenAI response cache
+DEDUP_THRESHOLD = 0.5  # TF-IDF cosine similarity above which a generated idea is dropped as a duplicate
+
+# Data files
+DATA_DIR = get_data_dir()
+IDEAS_JSON_PATH = os.path.join(DATA_DIR, 'SaaS_ideas.json')
+CHECKPOINT_PATH = os.path.join(DATA_DIR, 'pipeline_checkpoint.json')
+METRICS_PATH = os.path.join(DATA_DIR, 'metrics', 'pipeline.prom')  # served by the app at /api/metrics
+
+# Idea store - SaaS_ideas.json is imported on first run and regenerated from the store
+idea_store = IdeaStore(os.path.join(DATA_DIR, 'ideas.db'), IDEAS_JSON_PATH)
+
+# OpenAI responses by hash of model, system prompt and comments, so re-runs cost no tokens
+llm_cache = LLMResponseCache(os.path.join(DATA_DIR, 'llm_cache.db'), LLM_CACHE_MAX_MB * 1024 * 1024)
+
+# Ids of comments already considered, shared with the backfill command
+processed_comments = ProcessedComments(os.path.join(DATA_DIR, 'processed_comments.db'))
 
 # Initialize OpenAI API
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Local comment scoring, optionally with a trained classifier
+COMMENT_CLASSIFIER_PATH = os.getenv('COMMENT_CLASSIFIER_PATH')
+comment_scorer = comment_filter.CommentFilter(
+    comment_filter.load_classifier(COMMENT_CLASSIFIER_PATH) if COMMENT_CLASSIFIER_PATH else None
+)
+
 # Initialize Reddit API
 REDDIT_CLIENT_ID = os.getenv('REDDIT_CLIENT_ID')
 REDDIT_CLIENT_SECRET = os.getenv('REDDIT_CLIENT_SECRET')
@@ -31,33 +82,66 @@ reddit = praw.Reddit(
     user_agent=REDDIT_USER_AGENT
 )
 
-# List of subreddits to monitor
-SUBREDDITS = ['SaaS', 'startups', 'Entrepreneur', 'technology', 'marketing', 'Productivity', 'techsupport']
+# List of subreddits to monitor (comma-separated REDDIT_SUBREDDITS overrides the default)
+DEFAULT_SUBREDDITS = ['SaaS', 'startups', 'Entrepreneur', 'technology', 'marketing', 'Productivity', 'techsupport']
+SUBREDDITS = [name.strip() for name in os.getenv('REDDIT_SUBREDDITS', ','.join(DEFAULT_SUBREDDITS)).split(',') if name.strip()]
+
+# 'combined' polls subreddits through a few r/sub1+sub2 streams grouped by comment velocity,
+# 'per_subreddit' runs one stream (and thread) per subreddit
+REDDIT_STREAM_MODE = os.getenv('REDDIT_STREAM_MODE', 'combined')
 
 # Global variables
-comments = ''
-comment_counter = 0
-generation_cooldown = False
+openai_usage = TokenUsage()  # Running totals of OpenAI token usage
+decode_stats = DecodeStats()  # Running idea yield of OpenAI responses
 pending_ideas_for_keyword_analysis = []  # Store ideas awaiting keyword analysis
-processing_lock = threading.Lock()  # Lock for thread synchronization
+processing_lock = threading.Lock()  # Guards subreddit_cooldowns
+keyword_batch_in_progress = []  # Pending ideas whose keyword metrics are being fetched
+keyword_analysis_lock = threading.Lock()  # Guards pending_ideas_for_keyword_analysis and keyword_batch_in_progress
 subreddit_cooldowns = {subreddit: 0 for subreddit in SUBREDDITS}  # Track last comment time per subreddit
+export_lock = threading.Lock()  # Serializes exports of the idea store
+last_export_time = 0
+export_timer = None  # Deferred export of ideas stored since a throttled export
+idea_deduplicator = None  # Built from the idea store on first use
+dedup_lock = threading.Lock()  # Guards building idea_deduplicator
+
+# Metrics, written to METRICS_PATH while the pipeline runs
+comments_seen = metrics.counter('reddit_comments_seen_total', "Comments received from Reddit", ['subreddit'])
+comments_filtered = metrics.counter('reddit_comments_filtered_total', "Comments not sent to OpenAI", ['subreddit', 'reason'])
+comments_accepted = metrics.counter('reddit_comments_accepted_total', "Comments queued for a prompt", ['subreddit'])
+openai_latency = metrics.histogram('openai_request_seconds', "Duration of OpenAI completions, including retries")
+openai_tokens = metrics.counter('openai_tokens_total', "OpenAI tokens used", ['type'])
+openai_cache_lookups = metrics.counter('openai_cache_lookups_total', "OpenAI response cache lookups", ['result'])
+ideas_generated = metrics.counter('ideas_generated_total', "Valid ideas decoded from OpenAI responses")
+ideas_invalid = metrics.counter('ideas_invalid_total', "Ideas lost to malformed or truncated OpenAI responses")
+ideas_duplicate = metrics.counter('ideas_duplicate_total', "Generated ideas dropped as near-duplicates")
+ideas_stored = metrics.counter('ideas_stored_total', "Ideas added to the idea store")
+file_write_seconds = metrics.histogram('file_write_seconds', "Duration of data file writes", ['file'])
+stage_items = metrics.gauge('pipeline_stage_items', "Items per pipeline stage by state", ['stage', 'state'])
+stage_busy_seconds = metrics.gauge('pipeline_stage_busy_seconds', "Seconds pipeline stage workers spent on items", ['stage'])
 
 def process_comment(comment):
-    """Process a new Reddit comment and add it to the collection if it meets criteria."""
-    global comments, comment_counter, generation_cooldown, subreddit_cooldowns
+    """
+    Filter stage: decide whether a new Reddit comment is worth sending to OpenAI.
+    
+    Returns:
+        Tuple of (score, comment text) for the batch stage, or None if the comment is skipped
+    """
+    subreddit_name = str(comment.subreddit)
+    comments_seen.inc(subreddit=subreddit_name)
     
     # Check if the comment contains bot disclaimer - skip if it does
     if "i am a bot" in comment.body.lower():
         print(f"Ignored bot comment in r/{comment.subreddit}\n\n")
-        return
+        comments_filtered.inc(subreddit=subreddit_name, reason='bot')
+        return None
     
     # Check if we need to respect the cooldown for this subreddit
-    subreddit_name = str(comment.subreddit)
     current_time = time.time()
     with processing_lock:
         if current_time - subreddit_cooldowns.get(subreddit_name, 0) < COMMENT_COOLDOWN:
             # Skip this comment if we're still in cooldown period for this subreddit
-            return
+            comments_filtered.inc(subreddit=subreddit_name, reason='cooldown')
+            return None
         
         # Update the cooldown timestamp for this subreddit
         subreddit_cooldowns[subreddit_name] = current_time
@@ -65,52 +149,184 @@ def process_comment(comment):
     comment_body = comment.body.strip()
     
     # Check if the comment meets the minimum word count
-    if len(comment_body.split()) >= MIN_WORD_COUNT:
-        # Wait if we're in generation cooldown
-        while generation_cooldown:
-            time.sleep(2)
-        
-        # Lock to prevent race conditions when modifying shared variables
-        with processing_lock:
-            # Don't proceed if another thread has triggered generation
-            if generation_cooldown:
-                return
-                
-            comments += comment_body + '\n\n'
-            comment_counter += 1
-            
-            print(f"{comment_counter}# comment in r/{subreddit_name}:\n\n{comment_body}\n\n\n")
-            
-            if comment_counter >= COMMENTS_PER_OPENAI_REQUEST:
-                comment_counter = 0
-                # Set cooldown before releasing lock to prevent other threads from entering
-                generation_cooldown = True
-        
-        # Only one thread will get here when the counter reaches the threshold
-        if generation_cooldown:
-            try:
-                get_SaaS_ideas(comments)
-            finally:
-                # Reset state after generation
-                with processing_lock:
-                    generation_cooldown = False
-                    comments = ''  # Clear the comments after processing
-    else:
+    if len(comment_body.split()) < MIN_WORD_COUNT:
         print(f"Ignored comment in r/{subreddit_name} due to insufficient length.\n\n")
+        comments_filtered.inc(subreddit=subreddit_name, reason='too short')
+        return None
+    
+    score, reason = comment_scorer.score(comment_body)
+    if score is None:
+        print(f"Ignored {reason} comment in r/{subreddit_name}.\n\n")
+        comments_filtered.inc(subreddit=subreddit_name, reason=reason)
+        return None
+    
+    # Skip comments already considered by the live stream or a backfill. Only comments
+    # accepted for ranking are recorded; the prompt batcher picks the best of them.
+    if not processed_comments.add_if_new(comment.id):
+        comments_filtered.inc(subreddit=subreddit_name, reason='already processed')
+        return None
+    
+    comments_accepted.inc(subreddit=subreddit_name)
+    print(f"Comment in r/{subreddit_name} (score {score:.1f}):\n\n{comment_body}\n\n\n")
+    return score, comment_body
+
+def batch_comment(scored_comment):
+    """
+    Batch stage: add a scored comment to the prompt batcher, which ranks comments
+    and hands full prompts to the generate stage.
+    """
+    score, comment_body = scored_comment
+    prompt_batcher.add(comment_body, score)
+    return None
+
+def enqueue_comment_batch(batch):
+    """Queue a prompt of comments for the generate stage (the oldest is dropped if it's full)."""
+    comment_pipeline['generate'].put(batch)
+
+# Packs comments into prompts by token budget
+prompt_batcher = PromptBatcher(
+    enqueue_comment_batch, PROMPT_TOKEN_BUDGET, PROMPT_MAX_LATENCY, candidate_factor=PROMPT_CANDIDATE_FACTOR
+)
+
+def generate_ideas(comments):
+    """
+    Generate stage: turn a prompt of comments into new, non-duplicate ideas.
+    
+    Returns:
+        List of ideas for the persist stage, or None if there are none
+    """
+    print("Generating SaaS ideas from comments...")
+    new_ideas = drop_duplicate_ideas(prepare_ideas(gpt_request(comments)))
+    return new_ideas or None
+
+def persist_ideas(new_ideas):
+    """
+    Persist stage: store ideas first, so they have ids when their keyword metrics are written,
+    and only then add them to the duplicate index.
+    """
+    if append_to_ideas_file(new_ideas):
+        index_stored_ideas(new_ideas)
+    return new_ideas
+
+def build_pipeline(filter_handler=None, generate_handler=None, persist_handler=None, enrich_handler=None, bulk=False):
+    """
+    Build the ingestion pipeline: filter -> batch -> generate -> persist -> enrich,
+    connected by bounded queues. Handlers can be swapped for fakes when testing stages.
+    
+    Parameters:
+        bulk: Block producers when generation falls behind instead of dropping the oldest
+            prompt, for backfills where every comment should be used.
+    
+    Returns:
+        Pipeline that isn't started yet; comments are fed with pipeline.put(comment)
+    """
+    return Pipeline([
+        Stage('filter', filter_handler or process_comment, workers=FILTER_WORKERS, queue_size=COMMENT_QUEUE_SIZE),
+        # A single worker, so the batcher sees comments in arrival order
+        Stage('batch', batch_comment, workers=1, queue_size=COMMENT_QUEUE_SIZE),
+        Stage('generate', generate_handler or generate_ideas, workers=GENERATION_WORKERS,
+              queue_size=GENERATION_QUEUE_SIZE, overflow=BLOCK if bulk else DROP_OLDEST),
+        Stage('persist', persist_handler or persist_ideas, workers=1, queue_size=IDEA_QUEUE_SIZE),
+        # Keyword metrics are fetched in batches of BATCH_SIZE_FOR_KEYWORD_ANALYSIS, one at a time
+        Stage('enrich', enrich_handler or add_keyword_stats, workers=1, queue_size=IDEA_QUEUE_SIZE),
+    ])
+
+def pipeline_snapshot():
+    """Work buffered in the pipeline, in a JSON-serializable form for the checkpoint."""
+    return {
+        "comments": [save_comment(comment) for comment in comment_pipeline['filter'].pending_items()],
+        "scored_comments": [list(item) for item in comment_pipeline['batch'].pending_items() + prompt_batcher.pending_items()],
+        "prompts": comment_pipeline['generate'].pending_items(),
+        "ideas": comment_pipeline['persist'].pending_items(),
+        "keyword_ideas": pending_keyword_ideas(),
+    }
+
+def pending_keyword_ideas():
+    """Stored ideas queued for, waiting for or in the middle of keyword analysis, without duplicates."""
+    # The enrich stage is read first: its ideas are only dropped from it once they are in the pending list
+    ideas = [idea for new_ideas in comment_pipeline['enrich'].pending_items() for idea in new_ideas]
+    with keyword_analysis_lock:
+        ideas += keyword_batch_in_progress + pending_ideas_for_keyword_analysis
+    unique = {}
+    for idea in ideas:
+        unique.setdefault(idea.get('id'), idea)
+    return list(unique.values())
+
+def restore_checkpoint():
+    """
+    Put work saved in the checkpoint back into the pipeline, including the ideas
+    that were awaiting keyword metrics.
+    """
+    restored = pipeline_checkpoint.restored
+    for comment in restored.get('comments', []):
+        comment_pipeline['filter'].put(SavedComment(**comment))
+    for score, text in restored.get('scored_comments', []):
+        comment_pipeline['batch'].put((score, text))
+    for prompt in restored.get('prompts', []):
+        comment_pipeline['generate'].put(prompt)
+    for ideas in restored.get('ideas', []):
+        comment_pipeline['persist'].put(ideas)
+    pipeline_checkpoint.restored = {}
+    
+    # Only the saved list is restored: stored ideas without metrics also include ideas
+    # whose keywords got no data, which would be re-billed on every start
+    with keyword_analysis_lock:
+        known_ids = {idea.get('id') for idea in pending_ideas_for_keyword_analysis}
+        missing = [idea for idea in restored.get('keyword_ideas', []) if idea.get('id') not in known_ids]
+        pending_ideas_for_keyword_analysis.extend(missing)
+    
+    counts = {key: len(value) for key, value in restored.items()}
+    print(f"Restored pipeline state: {counts}")
+
+def collect_stage_metrics():
+    """Copy the pipeline stages' counters into the metrics registry."""
+    for name, stage_metrics in comment_pipeline.metrics().items():
+        for state in ('received', 'processed', 'emitted', 'failed', 'dropped', 'queued'):
+            stage_items.set(stage_metrics[state], stage=name, state=state)
+        stage_busy_seconds.set(stage_metrics['busy_seconds'], stage=name)
+
+def start_pipeline():
+    """Start the stage workers, the prompt batcher's timer, checkpointing, the metrics file and periodic metrics logging."""
+    comment_pipeline.start()
+    prompt_batcher.start()
+    restore_checkpoint()
+    pipeline_checkpoint.start()
+    metrics.registry.add_collector(collect_stage_metrics)
+    metrics.registry.start_textfile_writer(METRICS_PATH)
+    
+    def log_metrics():
+        while True:
+            time.sleep(PIPELINE_METRICS_INTERVAL)
+            comment_pipeline.log_metrics()
+            print(f"OpenAI usage so far: {openai_usage.summary()}")
+            print(f"OpenAI response yield so far: {decode_stats.summary()}")
+    
+    thread = threading.Thread(target=log_metrics, name="pipeline-metrics")
+    thread.daemon = True
+    thread.start()
+    return comment_pipeline
 
 def fetch_new_comments():
     """Continuously fetch new comments from monitored subreddits."""
     print("Fetching new comments...\n\n")
     
+    if REDDIT_STREAM_MODE != 'per_subreddit':
+        MultiplexedStream(reddit, SUBREDDITS, comment_pipeline.put, checkpoint=pipeline_checkpoint).run()
+        return
+    
     def monitor_subreddit(subreddit):
         """Monitor a specific subreddit for new comments."""
         subreddit_instance = reddit.subreddit(subreddit)
         print(f'Now monitoring {subreddit}')
+        # Resume after the last checkpointed comment instead of skipping everything posted meanwhile
+        resume = pipeline_checkpoint.has_position([subreddit])
         try:
-            for comment in subreddit_instance.stream.comments(skip_existing=True):
-                # Process directly instead of creating a new thread for each comment
-                # This prevents thread explosion
-                process_comment(comment)
+            for comment in subreddit_instance.stream.comments(skip_existing=not resume):
+                if not pipeline_checkpoint.is_new(comment):
+                    continue
+                # Hand off to the filter stage; blocks if the pipeline is backed up
+                comment_pipeline.put(comment)
+                pipeline_checkpoint.mark_seen(comment)
         except Exception as e:
             print(f"Error fetching comments from r/{subreddit}: {e}")
             time.sleep(5)  # Wait before retrying to avoid rapid failure
@@ -130,18 +346,16 @@ def fetch_new_comments():
     except KeyboardInterrupt:
         print("Stopping comment monitoring...")
 
-def add_keyword_stats(new_ideas):
+def prepare_ideas(new_ideas):
     """
-    Add keyword statistics to each idea.
+    Normalize freshly generated ideas before they are stored.
     
     Parameters:
         new_ideas: List of SaaS idea dictionaries
         
     Returns:
-        Updated list with metrics added to each idea
+        The same list with keywords as lists and metrics initialized to None
     """
-    global pending_ideas_for_keyword_analysis
-    
     # Process the keywords format (convert string to list if needed)
     for idea in new_ideas:
         if 'keywords' in idea and isinstance(idea['keywords'], str):
@@ -157,109 +371,123 @@ def add_keyword_stats(new_ideas):
         idea['competition_level'] = None
         idea['revenue'] = None
     
-    # Add to pending ideas list
-    pending_ideas_for_keyword_analysis.extend(new_ideas)
+    return new_ideas
+
+def add_keyword_stats(new_ideas):
+    """
+    Queue stored ideas for keyword statistics, processing a batch once enough are pending.
+    
+    Parameters:
+        new_ideas: List of SaaS idea dictionaries
+        
+    Returns:
+        The list of ideas passed in
+    """
+    with keyword_analysis_lock:
+        # Add to pending ideas list
+        pending_ideas_for_keyword_analysis.extend(new_ideas)
+        batch_ready = len(pending_ideas_for_keyword_analysis) >= BATCH_SIZE_FOR_KEYWORD_ANALYSIS
     
     # Process in batches when we reach the threshold
-    if len(pending_ideas_for_keyword_analysis) >= BATCH_SIZE_FOR_KEYWORD_ANALYSIS:
+    if batch_ready:
         process_keyword_batch()
     
     return new_ideas
 
-def process_keyword_batch():
+def process_keyword_batch(ideas=None):
     """
     Process a batch of ideas for keyword analysis.
     Gets metrics for all keywords and updates the ideas in the file.
+    
+    Parameters:
+        ideas: Ideas to process. Defaults to taking everything pending, which is
+            put back in the pending list if processing fails.
     """
-    global pending_ideas_for_keyword_analysis
+    global pending_ideas_for_keyword_analysis, keyword_batch_in_progress
     
-    if not pending_ideas_for_keyword_analysis:
+    from_pending = ideas is None
+    if from_pending:
+        with keyword_analysis_lock:
+            ideas = pending_ideas_for_keyword_analysis
+            pending_ideas_for_keyword_analysis = []
+            # Kept visible to the checkpoint until the metrics are stored
+            keyword_batch_in_progress = ideas
+    
+    if not ideas:
         return
         
-    print(f"Processing keyword metrics for {len(pending_ideas_for_keyword_analysis)} ideas...")
+    print(f"Processing keyword metrics for {len(ideas)} ideas...")
     
-    # Extract all keywords from pending ideas - don't remove duplicates
+    # Extract all keywords from pending ideas - get_google_metrics deduplicates them
     all_keywords = []
-    for idea in pending_ideas_for_keyword_analysis:
+    for idea in ideas:
         all_keywords.extend(idea.get('keywords', []))
     
     # Get metrics for all keywords at once
     try:
         keyword_metrics = google_ads_metrics.get_google_metrics(all_keywords)
         
-        # Update each idea by averaging metrics across all its keywords
-        for idea in pending_ideas_for_keyword_analysis:
-            if 'keywords' in idea and idea['keywords']:
-                # Track metrics across all keywords for this idea
-                search_volumes = []
-                competition_levels_numeric = []
-                revenues = []
-                
-                # Collect metrics for each keyword
-                for keyword in idea['keywords']:
-                    if keyword in keyword_metrics:
-                        metrics = keyword_metrics[keyword]
-                        search_volumes.append(metrics[0])  # avg_monthly_searches
-                        
-                        # Convert competition level to numeric for averaging
-                        comp_level = metrics[1]
-                        if comp_level == "Very Low":
-                            competition_levels_numeric.append(10)
-                        elif comp_level == "Low":
-                            competition_levels_numeric.append(30)
-                        elif comp_level == "Moderate":
-                            competition_levels_numeric.append(50)
-                        elif comp_level == "High":
-                            competition_levels_numeric.append(70)
-                        elif comp_level == "Very High":
-                            competition_levels_numeric.append(90)
-                        else:  # N/A or other
-                            competition_levels_numeric.append(0)
-                            
-                        revenues.append(metrics[2])  # revenue
-                
-                # Calculate averages if we have data
-                if search_volumes:
-                    idea['avg_monthly_searches'] = sum(search_volumes) # don't average, just sum
-                    
-                    # Convert average competition index back to string level
-                    if competition_levels_numeric:
-                        avg_comp_index = sum(competition_levels_numeric) / len(competition_levels_numeric)
-                        idea['competition_level'] = google_ads_metrics.map_competition(avg_comp_index)
-                    
-                    if revenues:
-                        idea['revenue'] = int(sum(revenues) / len(revenues))
+        # Update each idea by aggregating metrics across all its keywords, for the whole batch at once
+        metric_aggregation.aggregate_idea_metrics(ideas, keyword_metrics)
         
         # Update the ideas in the file
-        update_ideas_file(pending_ideas_for_keyword_analysis)
-        
-        # Clear the pending list
-        pending_ideas_for_keyword_analysis = []
+        update_ideas_file(ideas)
         print("Keyword metrics processing complete.")
     except Exception as e:
         print(f"Error processing keyword metrics: {e}")
+        if from_pending:
+            # Keep the ideas pending so the next batch retries them
+            with keyword_analysis_lock:
+                pending_ideas_for_keyword_analysis = ideas + pending_ideas_for_keyword_analysis
+    finally:
+        if from_pending:
+            with keyword_analysis_lock:
+                keyword_batch_in_progress = []
 
-def get_SaaS_ideas(comments):
-    """Generate SaaS ideas from collected comments."""
-    print("Generating SaaS ideas from comments...")
-    new_ideas = add_keyword_stats(gpt_request(comments))
-    append_to_ideas_file(new_ideas)
-    print("New ideas created and appended to file\n\n")
+def get_idea_deduplicator():
+    """Return the near-duplicate index, building it from all stored ideas on first use."""
+    global idea_deduplicator
+    with dedup_lock:
+        if idea_deduplicator is None:
+            idea_deduplicator = IdeaDeduplicator(DEDUP_THRESHOLD).build(idea_store.iter_ideas())
+            print(f"Built duplicate index over {len(idea_deduplicator)} ideas")
+        return idea_deduplicator
 
-def gpt_request(comments):
+def index_stored_ideas(ideas):
+    """Add stored ideas to the duplicate index, unless it isn't built yet (building reads them from the store)."""
+    with dedup_lock:
+        if idea_deduplicator is not None:
+            for idea in ideas:
+                idea_deduplicator.add(idea)
+
+def drop_duplicate_ideas(new_ideas):
     """
-    Send comments to OpenAI API to generate SaaS ideas.
+    Drop generated ideas that are near-duplicates of a stored idea or of each other.
+    The ideas that are kept are indexed by the persist stage once they are stored.
     
     Parameters:
-        comments: String containing collected Reddit comments
-        
+        new_ideas: List of new SaaS idea dictionaries
+    
     Returns:
-        List of SaaS idea dictionaries
+        List of ideas that aren't duplicates
     """
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": """You are an AI specialized in generating thoughtful 
+    if not new_ideas:
+        return new_ideas
+    
+    new_ideas, duplicates = get_idea_deduplicator().filter_new(new_ideas)
+    ideas_duplicate.inc(len(duplicates))
+    for idea, existing_title, similarity in duplicates:
+        print(f"Dropped duplicate idea '{idea.get('product_title')}' (similar to '{existing_title}', {similarity:.2f})")
+    return new_ideas
+
+def get_SaaS_ideas(comments):
+    """Generate SaaS ideas from collected comments and store them, bypassing the pipeline queues."""
+    new_ideas = generate_ideas(comments)
+    if new_ideas:
+        add_keyword_stats(persist_ideas(new_ideas))
+    print("New ideas created and appended to file\n\n")
+
+IDEA_SYSTEM_PROMPT = """You are an AI specialized in generating thoughtful 
             and creative SaaS product ideas based on provided reddit posts. When you receive a set 
             of reddit posts, analyze the feedback, challenges, and ideas presented, and generate a 
             JSON array of product ideas. Each product idea must be an object with exactly three keys: 
@@ -270,73 +498,156 @@ def gpt_request(comments):
             audience would search for.\n\nEnsure that your output is strictly valid JSON with 
             no additional text, markdown formatting, or commentary. If you are unsure or cannot derive any 
             product ideas, output an empty JSON array (i.e., []).\n\nFocus on creativity and depth in your ideas, 
-            closely aligning them with the themes and content of the provided reddit posts."""},
-            {
-                "role": "user",
-                "content": comments
-            }
-        ]
-    )
-    
-    response = completion.choices[0].message.content  
-    try: 
-        return json.loads(response)  # Assuming the response is valid JSON
-    except:
-        print(f'GPT provided an invalid json:\n{response}\n\n')
-        return []  # Return empty list instead of recursive call to avoid potential infinite recursion
+            closely aligning them with the themes and content of the provided reddit posts."""
+
+def create_completion_with_backoff(**kwargs):
+    """
+    Create a chat completion, retrying rate-limited and transient failures
+    with exponential backoff (honoring the Retry-After header when present).
+    """
+    for attempt in range(GPT_MAX_RETRIES + 1):
+        try:
+            return client.chat.completions.create(**kwargs)
+        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt == GPT_MAX_RETRIES:
+                raise
+            
+            delay = GPT_BACKOFF_BASE * (2 ** attempt)
+            retry_after = getattr(getattr(e, 'response', None), 'headers', {}).get('retry-after')
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            delay += random.uniform(0, 1)  # jitter so workers don't retry in lockstep
+            
+            print(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def gpt_request(comments):
+    """
+    Send comments to OpenAI API to generate SaaS ideas.
+    Responses are cached, so the same comments are never paid for twice.
+    
+    Parameters:
+        comments: String containing collected Reddit comments
+        
+    Returns:
+        List of SaaS idea dictionaries
+    """
+    key = cache_key(GPT_MODEL, IDEA_SYSTEM_PROMPT, comments)
+    cached = llm_cache.get(key)
+    openai_cache_lookups.inc(result='hit' if cached else 'miss')
+    if cached:
+        # Decode the raw response again, so entries cached before a decoder fix benefit too
+        ideas, _ = decode_ideas(cached[0])
+        print(f"LLM cache hit - reusing {len(ideas)} ideas without an OpenAI request")
+        return ideas
+    
+    with openai_latency.time():
+        completion = create_completion_with_backoff(
+            model=GPT_MODEL,
+            messages=[
+                {"role": "system", "content": IDEA_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": comments
+                }
+            ]
+        )
+    
+    prompt_tokens, completion_tokens = openai_usage.record(completion.usage)
+    openai_tokens.inc(prompt_tokens, type='prompt')
+    openai_tokens.inc(completion_tokens, type='completion')
+    totals = openai_usage.summary()
+    print(f"OpenAI usage: {prompt_tokens} prompt + {completion_tokens} completion tokens "
+          f"({totals['prompt_tokens'] + totals['completion_tokens']} tokens over {totals['requests']} requests)")
+    
+    response = completion.choices[0].message.content or ''
+    # Salvage every valid idea instead of discarding the whole batch on a JSON error
+    ideas, report = decode_ideas(response)
+    decode_stats.record(report)
+    ideas_generated.inc(report['valid'])
+    ideas_invalid.inc(report['invalid'])
+    if report['repaired'] or report['invalid']:
+        print(f"Recovered {report['valid']} of {report['found']} ideas from a malformed OpenAI response "
+              f"(truncated: {report['truncated']})")
+        if not ideas:
+            print(f'GPT provided an invalid json:\n{response}\n\n')
+    
+    llm_cache.put(key, GPT_MODEL, response, ideas)
+    return ideas
+
+def export_ideas(force=False):
+    """
+    Export the idea store to SaaS_ideas.json and the CSV served by the app.
+    Unless forced, exports at most once every EXPORT_INTERVAL seconds; a throttled
+    export is deferred until the interval has passed, so no stored idea waits for
+    the next append to be exported.
+    """
+    global last_export_time, export_timer
+    
+    with export_lock:
+        remaining = EXPORT_INTERVAL - (time.time() - last_export_time)
+        if not force and remaining > 0:
+            if export_timer is None:
+                export_timer = threading.Timer(remaining, run_deferred_export)
+                export_timer.daemon = True
+                export_timer.start()
+            return
+        
+        if export_timer is not None:
+            export_timer.cancel()
+            export_timer = None
+        
+        try:
+            with file_write_seconds.time(file='SaaS_ideas.json'):
+                count = idea_store.export_json(IDEAS_JSON_PATH)
+            with file_write_seconds.time(file='SaaS_Niche_opportunities.csv'):
+                json_to_csv.json_to_csv(idea_store.iter_ideas())
+            last_export_time = time.time()
+            print(f"Exported {count} ideas to: {IDEAS_JSON_PATH}")
+        except Exception as e:
+            print(f"Error exporting ideas to {IDEAS_JSON_PATH}: {e}")
+
+def run_deferred_export():
+    """Timer callback: export unless another export has already replaced this timer."""
+    if export_timer is threading.current_thread():
+        export_ideas(force=True)
+
+def flush_pending_export():
+    """Run a deferred export now, e.g. on shutdown, when the timer thread would be lost."""
+    if export_timer is not None:
+        export_ideas(force=True)
 
 def append_to_ideas_file(new_ideas):
     """
-    Append new ideas to the SaaS_ideas.json file.
+    Append new ideas to the idea store and periodically export SaaS_ideas.json.
     
     Parameters:
         new_ideas: List of new SaaS idea dictionaries to append
+    
+    Returns:
+        True if the ideas were stored
     """
     if not new_ideas:
         print("No new ideas to append.")
-        return
-        
-    # Determine the project root directory
-    # If running from backend directory, go up one level
-    if os.path.basename(os.getcwd()) == 'backend':
-        base_dir = os.path.dirname(os.getcwd())  # Go up one level
-    else:
-        base_dir = os.getcwd()  # Assume we're already at the root
-        
-    file_path = os.path.join(base_dir, 'data', 'SaaS_ideas.json')
+        return False
     
     try:
-        # Create directories if they don't exist
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Load existing ideas if file exists
-        existing_ideas = []
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r') as f:
-                    content = f.read().strip()
-                    if content:  # Only parse if file is not empty
-                        existing_ideas = json.loads(content)
-                    else:
-                        existing_ideas = []
-            except json.JSONDecodeError:
-                print(f"Error reading {file_path}. Starting with empty list.")
-        
-        # Combine existing and new ideas
-        all_ideas = existing_ideas + new_ideas
-        
-        # Save all ideas back to file
-        with open(file_path, 'w') as f:
-            json.dump(all_ideas, f, indent=2)
-        
-        print(f"Added {len(new_ideas)} new ideas. Ideas pending for keyword metrics: {len(pending_ideas_for_keyword_analysis)}. Total: {len(all_ideas)}")
-        print(f"File saved to: {file_path}")
+        idea_store.append_ideas(new_ideas)
+        ideas_stored.inc(len(new_ideas))
+        print(f"Added {len(new_ideas)} new ideas. Ideas pending for keyword metrics: {len(pending_ideas_for_keyword_analysis)}. Total: {idea_store.count()}")
     except Exception as e:
-        print(f"Error saving to {file_path}: {e}")
+        print(f"Error saving ideas to {idea_store.db_path}: {e}")
+        return False
+    
+    export_ideas()
+    return True
 
 def update_ideas_file(updated_ideas):
     """
-    Update existing ideas in the SaaS_ideas.json file with new metrics.
+    Update existing ideas in the idea store with new metrics and export SaaS_ideas.json.
     
     Parameters:
         updated_ideas: List of idea dictionaries with updated metrics
@@ -344,86 +655,36 @@ def update_ideas_file(updated_ideas):
     if not updated_ideas:
         return
     
-    # Determine the project root directory
-    # If running from backend directory, go up one level
-    if os.path.basename(os.getcwd()) == 'backend':
-        base_dir = os.path.dirname(os.getcwd())  # Go up one level
-    else:
-        base_dir = os.getcwd()  # Assume we're already at the root
-        
-    file_path = os.path.join(base_dir, 'data', 'SaaS_ideas.json')
-    
     try:
-        # Load existing ideas
-        all_ideas = []
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r') as f:
-                    content = f.read().strip()
-                    if content:  # Only parse if file is not empty
-                        all_ideas = json.loads(content)
-                    else:
-                        all_ideas = []
-            except json.JSONDecodeError:
-                print(f"Error reading {file_path}.")
-                return
-        
-        # Create a dictionary for quick lookup of updated ideas by title
-        updated_ideas_dict = {idea['product_title']: idea for idea in updated_ideas if 'product_title' in idea}
-        
-        # Update each idea with new metrics if available
-        for idea in all_ideas:
-            if 'product_title' in idea and idea['product_title'] in updated_ideas_dict:
-                updated_idea = updated_ideas_dict[idea['product_title']]
-                idea['avg_monthly_searches'] = updated_idea.get('avg_monthly_searches', idea.get('avg_monthly_searches'))
-                idea['competition_level'] = updated_idea.get('competition_level', idea.get('competition_level'))
-                idea['revenue'] = updated_idea.get('revenue', idea.get('revenue'))
-        
-        # Save updated ideas back to file
-        with open(file_path, 'w') as f:
-            json.dump(all_ideas, f, indent=2)
-        
-        print(f"Updated metrics for {len(updated_ideas)} ideas.")
-        print(f"File updated at: {file_path}")
+        updated_count = idea_store.update_metrics(updated_ideas)
+        print(f"Updated metrics for {updated_count} ideas.")
     except Exception as e:
-        print(f"Error updating {file_path}: {e}")
+        print(f"Error updating ideas in {idea_store.db_path}: {e}")
+        return
+    
+    export_ideas(force=True)
 
-def generate_missing_metrics():
+def generate_missing_metrics(cached_only=False):
     """
     Generate metrics for all products that have null attributes.
-    This function reads the SaaS_ideas.json file, identifies ideas with null metrics,
+    This function queries the idea store for ideas with null metrics
     and processes them in batches to generate metrics.
-    """
-    # Determine the project root directory
-    if os.path.basename(os.getcwd()) == 'backend':
-        base_dir = os.path.dirname(os.getcwd())  # Go up one level
-    else:
-        base_dir = os.getcwd()  # Assume we're already at the root
-        
-    file_path = os.path.join(base_dir, 'data', 'SaaS_ideas.json')
     
+    Parameters:
+        cached_only: Only process ideas whose keywords are all in the keyword cache,
+            so no API operations are spent (used after a task-mode backfill).
+    """
     try:
-        # Load ideas from file
-        all_ideas = []
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                content = f.read().strip()
-                if content:
-                    all_ideas = json.loads(content)
-                else:
-                    all_ideas = []
-        
-        if not all_ideas:
-            print("No ideas found in the file.")
-            return
-        
         # Find ideas with null metrics
-        ideas_with_null_metrics = []
-        for idea in all_ideas:
-            if (idea.get('avg_monthly_searches') is None or 
-                idea.get('competition_level') is None or 
-                idea.get('revenue') is None):
-                ideas_with_null_metrics.append(idea)
+        ideas_with_null_metrics = list(idea_store.iter_ideas(missing_metrics_only=True, include_id=True))
+        
+        if cached_only:
+            keywords = list({normalize_keyword(keyword) for idea in ideas_with_null_metrics for keyword in idea['keywords']})
+            cached = google_ads_metrics.keyword_cache.get_many(keywords)
+            ideas_with_null_metrics = [
+                idea for idea in ideas_with_null_metrics
+                if all(normalize_keyword(keyword) in cached for keyword in idea['keywords'])
+            ]
         
         if not ideas_with_null_metrics:
             print("No ideas with null metrics found.")
@@ -431,36 +692,37 @@ def generate_missing_metrics():
         
         print(f"Found {len(ideas_with_null_metrics)} ideas with null metrics.")
         
-        # Process ideas in batches
-        global pending_ideas_for_keyword_analysis
-        
         # Process in batches respecting the BATCH_SIZE_FOR_KEYWORD_ANALYSIS limit
         for i in range(0, len(ideas_with_null_metrics), BATCH_SIZE_FOR_KEYWORD_ANALYSIS):
             batch = ideas_with_null_metrics[i:i+BATCH_SIZE_FOR_KEYWORD_ANALYSIS]
             print(f"Processing batch {i//BATCH_SIZE_FOR_KEYWORD_ANALYSIS + 1} with {len(batch)} ideas...")
             
-            # Clear pending list to avoid mixing with other operations
-            pending_ideas_for_keyword_analysis = []
-            
-            # Add the batch to the pending list
-            pending_ideas_for_keyword_analysis.extend(batch)
-            
-            # Process the batch
-            process_keyword_batch()
+            # Process the batch directly, without touching the pending list
+            process_keyword_batch(batch)
             
             print(f"Batch {i//BATCH_SIZE_FOR_KEYWORD_ANALYSIS + 1} processed.")
-            
+        
+        export_ideas(force=True)
         print(f"Finished processing all {len(ideas_with_null_metrics)} ideas with null metrics.")
         
     except Exception as e:
         print(f"Error generating missing metrics: {e}")
 
+# Ingestion pipeline fed by fetch_new_comments (built here, once every stage handler exists)
+comment_pipeline = build_pipeline()
+
+# Last seen comment per subreddit and buffered work, saved periodically and on shutdown
+pipeline_checkpoint = Checkpoint(CHECKPOINT_PATH, pipeline_snapshot)
+
 def run_pipeline():
     """Run the complete Reddit pipeline."""
-    fetch_new_comments()
+    start_pipeline()
+    try:
+        fetch_new_comments()
+    finally:
+        pipeline_checkpoint.save()
+        print(f"Saved pipeline checkpoint to {CHECKPOINT_PATH}")
+        flush_pending_export()
 
 if __name__ == "__main__":
     run_pipeline()
-
-
-
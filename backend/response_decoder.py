@@ -0,0 +1,186 @@
+import re
+import json
+import threading
+
+# Keys every generated idea must have
+IDEA_KEYS = ['product_title', 'description', 'keywords']
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_decoder = json.JSONDecoder()
+
+
+def strip_fences(text):
+    """Remove surrounding markdown code fences (```json ... ```)."""
+    return _FENCE_RE.sub('', text.strip())
+
+
+def remove_trailing_commas(text):
+    """Drop commas directly before a closing } or ], leaving string contents untouched."""
+    result = []
+    in_string = False
+    escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ',':
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ('}', ']'):
+                continue
+        result.append(char)
+    return ''.join(result)
+
+
+def _object_end(text, start):
+    """Index just past the object starting at text[start], or None if it never closes."""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def salvage_objects(text):
+    """
+    Parse top-level objects one by one from a possibly malformed or truncated JSON array.
+
+    Returns:
+        Tuple of (parsed objects, number of objects that couldn't be parsed or were cut off,
+        whether the text was truncated)
+    """
+    objects = []
+    broken = 0
+    position = text.find('[')
+    position = 0 if position == -1 else position + 1
+
+    while True:
+        start = text.find('{', position)
+        if start == -1:
+            return objects, broken, False
+        try:
+            value, position = _decoder.raw_decode(text, start)
+            objects.append(value)
+        except json.JSONDecodeError:
+            end = _object_end(text, start)
+            if end is None:
+                # The response was cut off inside this object, which counts as lost
+                return objects, broken + 1, True
+            broken += 1
+            position = end
+
+
+def validate_idea(value):
+    """
+    Check an object against the idea schema and normalize it.
+
+    Returns:
+        Idea dictionary with exactly IDEA_KEYS, or None if it doesn't fit the schema
+    """
+    if not isinstance(value, dict):
+        return None
+
+    title = value.get('product_title')
+    description = value.get('description')
+    keywords = value.get('keywords')
+    if not isinstance(title, str) or not title.strip() or not isinstance(description, str):
+        return None
+
+    if isinstance(keywords, str):
+        keywords = keywords.split(',')
+    if not isinstance(keywords, list):
+        return None
+    keywords = [keyword.strip() for keyword in keywords if isinstance(keyword, str) and keyword.strip()]
+    if not keywords:
+        return None
+
+    return {'product_title': title.strip(), 'description': description.strip(), 'keywords': keywords}
+
+
+def decode_ideas(response):
+    """
+    Decode an OpenAI response into ideas, recovering as much as possible from invalid JSON:
+    code fences are stripped, trailing commas removed, and every complete idea object is
+    salvaged from a malformed or truncated array.
+
+    Returns:
+        Tuple of (list of valid ideas, report dictionary with found/valid/invalid counts
+        and whether the response needed repairing or was truncated)
+    """
+    text = remove_trailing_commas(strip_fences(response or ''))
+    repaired = text != (response or '').strip()
+    truncated = False
+    broken = 0
+
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            # {"ideas": [...]} or a single idea object
+            lists = [value for value in parsed.values() if isinstance(value, list) and value and isinstance(value[0], dict)]
+            parsed = lists[0] if lists else [parsed]
+        objects = parsed if isinstance(parsed, list) else []
+    except json.JSONDecodeError:
+        repaired = True
+        objects, broken, truncated = salvage_objects(text)
+
+    ideas = [idea for idea in (validate_idea(value) for value in objects) if idea]
+    report = {
+        "found": len(objects) + broken,
+        "valid": len(ideas),
+        "invalid": len(objects) + broken - len(ideas),
+        "repaired": repaired,
+        "truncated": truncated,
+    }
+    return ideas, report
+
+
+class DecodeStats:
+    """Running totals of decode_ideas reports, for the idea yield of OpenAI responses."""
+
+    def __init__(self):
+        self.responses = 0
+        self.repaired = 0
+        self.truncated = 0
+        self.found = 0
+        self.valid = 0
+        self._lock = threading.Lock()
+
+    def record(self, report):
+        with self._lock:
+            self.responses += 1
+            self.repaired += report['repaired']
+            self.truncated += report['truncated']
+            self.found += report['found']
+            self.valid += report['valid']
+
+    def summary(self):
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "repaired": self.repaired,
+                "truncated": self.truncated,
+                "ideas_found": self.found,
+                "ideas_valid": self.valid,
+                "yield": self.valid / self.found if self.found else 1.0,
+            }
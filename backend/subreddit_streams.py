@@ -0,0 +1,174 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+
+# Settings
+MAX_STREAMS = 4  # max concurrent combined streams (threads polling Reddit)
+GROUP_MAX_RATE = 2.0  # comments per second one combined stream should carry; listings return 100 comments per poll
+REPLAN_INTERVAL = 900  # seconds between regrouping subreddits by observed velocity
+VELOCITY_HALF_LIFE = 1800  # seconds for the comment velocity average to halve its weight
+DEFAULT_RATE = 0.05  # assumed comments per second for a subreddit that hasn't been observed yet
+SEEN_COMMENT_IDS = 20000  # recent comment ids remembered, so restarted streams don't repeat comments
+
+
+class VelocityTracker:
+    """Exponentially decaying comments-per-second estimate per subreddit."""
+
+    def __init__(self, half_life=VELOCITY_HALF_LIFE):
+        self.half_life = half_life
+        self.started = time.monotonic()
+        self.counts = {}
+        self.updated = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, subreddit, now):
+        count = self.counts.get(subreddit, 0.0)
+        elapsed = now - self.updated.get(subreddit, now)
+        return count * 0.5 ** (elapsed / self.half_life)
+
+    def record(self, subreddit):
+        now = time.monotonic()
+        with self._lock:
+            self.counts[subreddit] = self._decayed(subreddit, now) + 1
+            self.updated[subreddit] = now
+
+    def rate(self, subreddit):
+        """Comments per second, or None if the subreddit hasn't been observed long enough."""
+        now = time.monotonic()
+        with self._lock:
+            window = min(now - self.started, self.half_life / math.log(2))
+            if window < 60:
+                return None
+            # A decayed count divided by the mean lifetime of a count approximates the rate
+            return self._decayed(subreddit, now) / window
+
+
+def plan_stream_groups(subreddits, rates, max_streams=MAX_STREAMS, group_max_rate=GROUP_MAX_RATE):
+    """
+    Split subreddits into combined streams so no stream carries much more than
+    group_max_rate comments per second.
+
+    Enough groups for the total rate are opened (up to max_streams), then subreddits are
+    placed busiest first, each into the currently least loaded group, so the load is
+    spread as evenly as possible.
+
+    Parameters:
+        subreddits: List of subreddit names.
+        rates: Dictionary of subreddit -> comments per second (missing means unknown).
+
+    Returns:
+        List of subreddit name lists, one per stream
+    """
+    ordered = sorted(subreddits, key=lambda name: rates.get(name) or DEFAULT_RATE, reverse=True)
+    total_rate = sum(rates.get(name) or DEFAULT_RATE for name in ordered)
+    group_count = min(max_streams, len(ordered), max(1, int(-(-total_rate // group_max_rate))))
+
+    groups = [[] for _ in range(group_count)]
+    loads = [0.0] * group_count
+    for name in ordered:
+        target = loads.index(min(loads))
+        groups[target].append(name)
+        loads[target] += rates.get(name) or DEFAULT_RATE
+
+    return [sorted(group) for group in groups if group]
+
+
+class MultiplexedStream:
+    """
+    Polls many subreddits through a few combined r/sub1+sub2+... streams.
+
+    Comment velocity is tracked per subreddit, and every REPLAN_INTERVAL the subreddits are
+    regrouped so busy ones don't crowd quiet ones out of the 100-comment listings, while the
+    number of polling threads (and Reddit API calls) stays at most MAX_STREAMS.
+    """
+
+    def __init__(self, reddit, subreddits, on_comment, max_streams=MAX_STREAMS, replan_interval=REPLAN_INTERVAL,
+                 checkpoint=None):
+        """
+        Parameters:
+            reddit: praw.Reddit instance.
+            subreddits: List of subreddit names to monitor.
+            on_comment: Function called with each new comment.
+            checkpoint: Optional checkpoint.Checkpoint; streams resume after its last seen
+                comments and record every comment handed to on_comment.
+        """
+        self.reddit = reddit
+        self.checkpoint = checkpoint
+        self.subreddits = list(subreddits)
+        self.on_comment = on_comment
+        self.max_streams = max_streams
+        self.replan_interval = replan_interval
+        self.velocity = VelocityTracker()
+        self.groups = []
+        self._seen = OrderedDict()
+        self._seen_lock = threading.Lock()
+        self._generation = 0
+
+    def _is_new(self, comment_id):
+        with self._seen_lock:
+            if comment_id in self._seen:
+                return False
+            self._seen[comment_id] = None
+            if len(self._seen) > SEEN_COMMENT_IDS:
+                self._seen.popitem(last=False)
+            return True
+
+    def _monitor(self, group, generation, skip_existing):
+        """Consume one combined stream until the groups are re-planned."""
+        name = '+'.join(group)
+        print(f'Now monitoring r/{name}')
+        while generation == self._generation:
+            try:
+                # pause_after=0 yields None after every empty poll, so the thread notices re-planning
+                stream = self.reddit.subreddit(name).stream.comments(skip_existing=skip_existing, pause_after=0)
+                for comment in stream:
+                    if generation != self._generation:
+                        return
+                    if comment is None or not self._is_new(comment.id):
+                        continue
+                    if self.checkpoint and not self.checkpoint.is_new(comment):
+                        continue
+                    self.velocity.record(str(comment.subreddit).lower())
+                    self.on_comment(comment)
+                    if self.checkpoint:
+                        self.checkpoint.mark_seen(comment)
+            except Exception as e:
+                print(f"Error fetching comments from r/{name}: {e}")
+                time.sleep(5)  # Wait before retrying to avoid rapid failure
+            # A restarted stream replays recent comments; _is_new filters the ones already seen
+            skip_existing = False
+
+    def _start_groups(self, groups, skip_existing):
+        self._generation += 1
+        self.groups = groups
+        for group in groups:
+            thread = threading.Thread(target=self._monitor, args=(group, self._generation, skip_existing))
+            thread.daemon = True
+            thread.start()
+
+    def rates(self):
+        return {name: self.velocity.rate(name.lower()) for name in self.subreddits}
+
+    def run(self):
+        """Start streaming and re-plan periodically. Blocks until interrupted."""
+        # With a checkpoint, the first poll returns recent comments and the checkpoint drops
+        # those already processed before the restart
+        resume = bool(self.checkpoint and self.checkpoint.has_position(self.subreddits))
+        self._start_groups(plan_stream_groups(self.subreddits, {}, self.max_streams), skip_existing=not resume)
+        print(f"Streaming {len(self.subreddits)} subreddits over {len(self.groups)} combined streams")
+
+        try:
+            while True:
+                time.sleep(self.replan_interval)
+                rates = self.rates()
+                groups = plan_stream_groups(self.subreddits, rates, self.max_streams)
+                busiest = sorted(rates.items(), key=lambda item: item[1] or 0, reverse=True)[:5]
+                print("Comment velocity (per minute): " + ', '.join(
+                    f"r/{name} {rate * 60:.1f}" for name, rate in busiest if rate is not None
+                ))
+                if groups != self.groups:
+                    print(f"Regrouping subreddits into {len(groups)} streams: {groups}")
+                    self._start_groups(groups, skip_existing=False)
+        except KeyboardInterrupt:
+            print("Stopping comment monitoring...")